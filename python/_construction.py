@@ -0,0 +1,124 @@
+import numpy as np
+
+
+def vehicle_time_matrices(
+    time_matrix: np.ndarray, vehicle_classes: list[int] | None, num_cars: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Matrices per speed class, shape (k, n, n), and the class of every vehicle."""
+    time_matrices = time_matrix.reshape(-1, *time_matrix.shape[-2:])
+    if vehicle_classes is None:
+        vehicle_classes = [0] * num_cars
+    return time_matrices, np.asarray(vehicle_classes, dtype=np.int64)
+
+
+def greedy_routes(
+    time_matrix: np.ndarray,
+    pickup_nodes: np.ndarray,
+    delivery_nodes: np.ndarray,
+    start_nodes: list[int],
+    max_customers_per_vehicle: list[int],
+    solve_for_shortest_path: bool = False,
+    vehicle_classes: list[int] | None = None,
+) -> list[list[int]]:
+    """Build routes (customer indices per vehicle) by insertion.
+
+    Customers are driven from pickup straight to their destination and
+    appended to the end of a route. For the makespan, every step appends the
+    customer with the largest regret (the most to lose if it does not get the
+    vehicle that drops it off earliest) to that vehicle. For the shortest
+    path, every step appends the customer that adds the least travel time,
+    which beat regret insertion there. Vehicles stop taking customers once
+    max_customers_per_vehicle is reached. time_matrix may hold one matrix per
+    speed class, see vehicle_classes.
+    """
+    num_customers = len(pickup_nodes)
+    num_cars = len(start_nodes)
+    time_matrices, vehicle_classes = vehicle_time_matrices(
+        time_matrix, vehicle_classes, num_cars
+    )
+    # job_times[v, c]: time for vehicle v to drive customer c to the destination
+    job_times = time_matrices[:, pickup_nodes, delivery_nodes][vehicle_classes]
+    job_times = job_times.astype(np.float64)
+    current_times = np.zeros(num_cars)
+    remaining = np.array(max_customers_per_vehicle)
+    assigned = np.zeros(num_customers, dtype=bool)
+
+    # costs[v, c]: time for vehicle v to drive to customer c and drop them off
+    start_nodes = np.asarray(start_nodes)
+    costs = (
+        time_matrices[
+            vehicle_classes[:, np.newaxis], start_nodes[:, np.newaxis], pickup_nodes
+        ]
+        + job_times
+    )
+    costs[remaining <= 0] = np.inf
+
+    routes = [[] for _ in range(num_cars)]
+    for _ in range(num_customers):
+        if solve_for_shortest_path:
+            vehicle, customer = np.unravel_index(np.argmin(costs), costs.shape)
+            if not np.isfinite(costs[vehicle, customer]):
+                raise ValueError("Vehicle capacities are too small for all customers.")
+        else:
+            vehicle, customer = _regret_insertion(costs + current_times[:, None])
+        routes[vehicle].append(int(customer))
+        current_times[vehicle] += costs[vehicle, customer]
+        remaining[vehicle] -= 1
+        assigned[customer] = True
+        costs[:, customer] = np.inf
+        if remaining[vehicle] > 0:
+            vehicle_matrix = time_matrices[vehicle_classes[vehicle]]
+            costs[vehicle] = (
+                vehicle_matrix[delivery_nodes[customer], pickup_nodes]
+                + job_times[vehicle]
+            )
+            costs[vehicle, assigned] = np.inf
+        else:
+            costs[vehicle] = np.inf
+    return routes
+
+
+def _regret_insertion(scores: np.ndarray) -> tuple[int, int]:
+    """(vehicle, customer) of the customer with the largest regret, see greedy_routes.
+
+    scores[v, c] is the cost of appending customer c to vehicle v, inf where
+    that is not possible.
+    """
+    if len(scores) > 1:
+        best, second_best = np.partition(scores, 1, axis=0)[:2]
+    else:
+        best, second_best = scores[0], np.full(scores.shape[1], np.inf)
+    with np.errstate(invalid="ignore"):
+        regret = second_best - best
+    # Assigned customers and customers no vehicle can take any more
+    regret[~np.isfinite(best)] = -np.inf
+    if regret.max() == -np.inf:
+        raise ValueError("Vehicle capacities are too small for all customers.")
+    customer = np.argmin(np.where(regret == regret.max(), best, np.inf))
+    return int(np.argmin(scores[:, customer])), int(customer)
+
+
+def evaluate_routes(
+    time_matrix: np.ndarray,
+    routes: list[list[int]],
+    pickup_nodes: np.ndarray,
+    delivery_nodes: np.ndarray,
+    start_nodes: list[int],
+    vehicle_classes: list[int] | None = None,
+) -> tuple[np.ndarray, int]:
+    """Route times (arrival at the last destination) and the latest arrival."""
+    time_matrices, vehicle_classes = vehicle_time_matrices(
+        time_matrix, vehicle_classes, len(routes)
+    )
+    route_times = np.zeros(len(routes), dtype=np.int64)
+    for vehicle, route in enumerate(routes):
+        if not route:
+            continue
+        customers = np.asarray(route)
+        nodes = np.empty(2 * len(customers) + 1, dtype=np.int64)
+        nodes[0] = start_nodes[vehicle]
+        nodes[1::2] = pickup_nodes[customers]
+        nodes[2::2] = delivery_nodes[customers]
+        vehicle_matrix = time_matrices[vehicle_classes[vehicle]]
+        route_times[vehicle] = vehicle_matrix[nodes[:-1], nodes[1:]].sum()
+    return route_times, int(route_times.max(initial=0))
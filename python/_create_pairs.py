@@ -1,19 +1,20 @@
+import numpy as np
+
 from scenario_model import Scenario
+from _scenario_columns import ScenarioColumns, as_columns
 
 
 def process_customers(
-    scenario: Scenario,
-) -> tuple[list[tuple[float, float]], list[tuple[int, int]]]:
-    locations = []
-    precedence_pairs = []
-
-    for customer in scenario.customers:
-        current_coord = (customer.coordX, customer.coordY)
-        destination_coord = (customer.destinationX, customer.destinationY)
-
-        current_index = len(locations)
-        locations.append(current_coord)
-        locations.append(destination_coord)
-
-        precedence_pairs.append((current_index, current_index + 1))
-    return locations, precedence_pairs
+    scenario: Scenario | ScenarioColumns,
+) -> tuple[np.ndarray, list[tuple[int, int]], list[str | None]]:
+    columns = as_columns(scenario)
+    num_customers = columns.num_customers
+    # Pickup of customer i is node 2i, its destination node 2i + 1
+    locations = np.empty((2 * num_customers, 2))
+    locations[0::2] = columns.customer_coords
+    locations[1::2] = columns.customer_destinations
+    precedence_pairs = [(2 * i, 2 * i + 1) for i in range(num_customers)]
+    # Customer ID for every node, so solutions never have to be mapped back
+    # through coordinates (which breaks for customers at the same spot)
+    node_customer_ids = np.repeat(columns.customer_ids, 2).tolist()
+    return locations, precedence_pairs, node_customer_ids
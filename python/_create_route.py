@@ -1,186 +1,592 @@
+from dataclasses import replace
 from pathlib import Path
 from scenario_model import Scenario
+from _scenario_columns import ScenarioColumns, as_columns
 from ortools.constraint_solver import pywrapcp
 from ortools.constraint_solver import routing_enums_pb2
 from _create_pairs import process_customers
+from _construction import evaluate_routes, greedy_routes
+from _metrics import SolveTrace
+from _solver_profile import SolverProfile, get_profile
+from _travel_time import get_travel_time_provider
 from _penalties import (
     add_max_overall_capacity_per_vehicle,
     add_pickup_delivery_constraints,
     minimize_largest_end_time,
     set_penalty_for_waiting_at_start,
     create_time_dimension,
+    create_time_matrices,
     minimize_total_travel_time,
 )
 import math
+from typing import Callable
+import numpy as np
 from absl import logging
 
 logging.set_verbosity(logging.INFO)
+import os
 import time
 
+# Neighbours per node for local search moves, unset or 0 considers all nodes
+NUM_NEIGHBOURS = int(os.environ.get("NUM_NEIGHBOURS", 0)) or None
+
+
+class NoSolutionError(ValueError):
+    """Raised when the search finds no solution and there is no fallback."""
+
 
 def get_list_of_customer_ids_from_nodes(
     car_routes: dict[int, list[int]],
-    locations: list[tuple[float, float]],
-    scenario: Scenario,
-) -> dict[int, list[str]]:
-    """Convert car_routes from indices to unique customer IDs."""
-
-    # Step 1: Remove the first and last elements of each route
-    car_routes = {
-        car: route[1:-1] if len(route) > 2 else [] for car, route in car_routes.items()
+    node_customer_ids: list[str | None],
+    scenario: ScenarioColumns,
+) -> dict[str, list[str]]:
+    """Convert car_routes from indices to unique customer IDs per vehicle ID."""
+    unique_car_routes = {}
+    for car, route in car_routes.items():
+        customer_ids = []
+        for node in route:
+            customer_id = node_customer_ids[node]
+            # Pickup and destination are visited back to back, so each
+            # customer shows up as two consecutive nodes
+            if customer_id is not None and (
+                not customer_ids or customer_ids[-1] != customer_id
+            ):
+                customer_ids.append(customer_id)
+        unique_car_routes[str(scenario.vehicle_ids[car])] = customer_ids
+    return unique_car_routes
+
+
+def get_nodes_from_customer_ids(
+    car_routes: dict[str, list[str]],
+    scenario: ScenarioColumns,
+    manager: pywrapcp.RoutingIndexManager,
+) -> list[list[int]]:
+    """Convert car_routes from customer IDs to routing indices (pickup, destination)."""
+    customer_index = {
+        customer_id: i for i, customer_id in enumerate(scenario.customer_ids.tolist())
     }
+    routes = []
+    for vehicle_id in scenario.vehicle_ids.tolist():
+        route = []
+        for customer_id in car_routes.get(vehicle_id, []):
+            if customer_id in customer_index:
+                i = customer_index[customer_id]
+                route += [manager.NodeToIndex(2 * i), manager.NodeToIndex(2 * i + 1)]
+        routes.append(route)
+    return routes
 
-    # Step 2: Create a customer lookup for (coordX, coordY) -> customer ID
-    customer_lookup = {
-        (customer.coordX, customer.coordY): customer.id
-        for customer in scenario.customers
+
+def pin_busy_vehicles(scenario: Scenario | ScenarioColumns) -> ScenarioColumns:
+    """Scenario of the customers still to be planned.
+
+    Vehicles that are busy with a customer start at the customer's
+    destination, and the customer is left out. Parts of the result can be
+    pinned again without changing them.
+    """
+    columns = as_columns(scenario)
+    customer_index = {
+        customer_id: i for i, customer_id in enumerate(columns.customer_ids.tolist())
     }
+    vehicle_coords = columns.vehicle_coords.copy()
+    open_customers = columns.customer_awaiting.copy()
+    for vehicle, customer_id in enumerate(columns.vehicle_customer_ids.tolist()):
+        customer = customer_index.get(customer_id)
+        if not columns.vehicle_available[vehicle] and customer is not None:
+            open_customers[customer] = False
+            vehicle_coords[vehicle] = columns.customer_destinations[customer]
+    return replace(
+        columns.subset(customers=open_customers), vehicle_coords=vehicle_coords
+    )
 
-    # Step 3: Replace indices with customer IDs
-    updated_car_routes = {
-        car: [
-            customer_lookup.get(locations[i])
-            for i in indices
-            if customer_lookup.get(locations[i]) is not None
+
+def replan_routing_solution(
+    scenario: Scenario | ScenarioColumns,
+    hub_coords: tuple[float, float] | None,
+    car_routes: dict[str, list[str]],
+    solve_for_shortest_path: bool = False,
+    max_solv_time_in_sec: float = 0.5,
+):
+    """Re-solve the remaining customers, starting from the routes in progress.
+
+    Vehicles that are busy with a customer are pinned to that trip: they start
+    at the customer's destination once their remaining travel time is over,
+    and the customer is not planned again, see pin_busy_vehicles.
+    """
+    remaining_scenario = pin_busy_vehicles(scenario)
+    # Remaining travel times are in seconds (NaN when unknown), the time
+    # dimension is in minutes
+    remaining_times = np.where(
+        remaining_scenario.vehicle_available,
+        0,
+        np.nan_to_num(remaining_scenario.vehicle_remaining_travel_time, nan=0.0),
+    )
+    vehicle_start_times = np.rint(np.maximum(remaining_times, 0) / 60).astype(int)
+
+    open_customer_ids = set(remaining_scenario.customer_ids.tolist())
+    initial_routes = {
+        vehicle_id: [
+            customer_id
+            for customer_id in car_routes.get(vehicle_id, [])
+            if customer_id in open_customer_ids
         ]
-        for car, indices in car_routes.items()
+        for vehicle_id in remaining_scenario.vehicle_ids.tolist()
     }
 
-    # Step 4: Remove duplicates while maintaining order
-    unique_car_routes = {
-        car: [item for i, item in enumerate(route) if item not in route[:i]]
-        for car, route in updated_car_routes.items()
-    }
+    # New customers are appended to the shortest route, so that the
+    # initial assignment visits every node.
+    routed_ids = {c for route in initial_routes.values() for c in route}
+    for customer_id in remaining_scenario.customer_ids.tolist():
+        if customer_id not in routed_ids:
+            shortest = min(initial_routes, key=lambda v: len(initial_routes[v]))
+            initial_routes[shortest].append(customer_id)
 
-    return unique_car_routes
+    return get_routing_solution(
+        remaining_scenario,
+        hub_coords,
+        solve_for_shortest_path,
+        max_solv_time_in_sec,
+        initial_routes=initial_routes,
+        vehicle_start_times=vehicle_start_times.tolist(),
+    )
 
 
-def get_routing_solution(
-    scenario: Scenario,
+SOLUTION_DTYPE = np.dtype(
+    [("node", np.int64), ("arrival", np.int64), ("vehicle", np.int32), ("is_end", bool)]
+)
+
+
+def extract_solution(
+    routing: pywrapcp.RoutingModel,
+    manager: pywrapcp.RoutingIndexManager,
+    solution: pywrapcp.Assignment,
+    verbose: bool = False,
+) -> np.ndarray:
+    """Walk every route once and return node, arrival time and vehicle per visit."""
+    time_dimension = routing.GetDimensionOrDie("Time")
+    rows = []
+    for vehicle_id in range(routing.vehicles()):
+        index = routing.Start(vehicle_id)
+        while True:
+            is_end = routing.IsEnd(index)
+            arrival = solution.Min(time_dimension.CumulVar(index))
+            rows.append((manager.IndexToNode(index), arrival, vehicle_id, is_end))
+            if is_end:
+                break
+            index = solution.Value(routing.NextVar(index))
+    solution_rows = np.array(rows, dtype=SOLUTION_DTYPE)
+
+    if verbose:
+        for vehicle_id in range(routing.vehicles()):
+            route = solution_rows[solution_rows["vehicle"] == vehicle_id]
+            nodes = " -> ".join(
+                f"Node {row['node']} Time({row['arrival']})" for row in route
+            )
+            print(f"Route for vehicle {vehicle_id}: {nodes}")
+    return solution_rows
+
+
+def add_solution_callback(
+    routing: pywrapcp.RoutingModel,
+    manager: pywrapcp.RoutingIndexManager,
+    scenario: ScenarioColumns,
+    node_customer_ids: list[str | None],
+    start_time: float,
+    on_solution: Callable[[dict], bool | None] | None,
+    should_stop: Callable[[], bool] | None = None,
+):
+    """Report each better solution to on_solution; returning True stops the search.
+
+    should_stop is asked at every solution, also the ones that are no better,
+    so that a cancelled search stops during a plateau too.
+    """
+    time_dimension = routing.GetDimensionOrDie("Time")
+    best_objective = None
+
+    def solution_callback():
+        nonlocal best_objective
+        if should_stop is not None and should_stop():
+            routing.solver().FinishCurrentSearch()
+            return
+        objective = routing.CostVar().Value()
+        if on_solution is None or (
+            best_objective is not None and objective >= best_objective
+        ):
+            return
+        best_objective = objective
+
+        car_routes = {}
+        latest_arrival = 0
+        for vehicle_id in range(routing.vehicles()):
+            index = routing.Start(vehicle_id)
+            route = []
+            while not routing.IsEnd(index):
+                route.append(manager.IndexToNode(index))
+                arrival = time_dimension.CumulVar(index).Min()
+                latest_arrival = max(latest_arrival, arrival)
+                index = routing.NextVar(index).Value()
+            car_routes[vehicle_id] = route
+        stop = on_solution(
+            {
+                "objective": objective,
+                "last_customer_at_destination_in_sec": latest_arrival,
+                "elapsed_time_in_sec": time.perf_counter() - start_time,
+                "car_routes": get_list_of_customer_ids_from_nodes(
+                    car_routes, node_customer_ids, scenario
+                ),
+            }
+        )
+        if stop:
+            routing.solver().FinishCurrentSearch()
+
+    routing.AddAtSolutionCallback(solution_callback)
+
+
+def build_locations(
+    scenario: ScenarioColumns, hub_coords: tuple[float, float] | None
+) -> tuple[np.ndarray, list[str | None], list[int], list[int]]:
+    """Nodes of the model: pickup/destination pairs, then vehicle starts and ends."""
+    customer_locations, _, node_customer_ids = process_customers(scenario)
+    end_locations = (
+        np.tile(hub_coords, (scenario.num_vehicles, 1))
+        if hub_coords
+        else scenario.vehicle_coords
+    )
+    locations = np.concatenate(
+        [customer_locations, scenario.vehicle_coords, end_locations]
+    )
+    node_customer_ids += [None] * (2 * scenario.num_vehicles)
+
+    first_start = len(customer_locations)
+    first_end = first_start + scenario.num_vehicles
+    vehicle_start_indeces = list(range(first_start, first_end))
+    vehicle_end_indeces = list(range(first_end, len(locations)))
+    return locations, node_customer_ids, vehicle_start_indeces, vehicle_end_indeces
+
+
+def get_vehicle_capacity(scenario: ScenarioColumns, capacity_factor: float = 3) -> int:
+    """Maximum number of nodes per vehicle (start node included).
+
+    capacity_factor times the fair share, but never so low that the fleet
+    cannot hold every pickup and delivery.
+    """
+    customers_per_vehicle = scenario.num_customers / scenario.num_vehicles
+    return max(
+        math.ceil(customers_per_vehicle * capacity_factor),
+        2 * math.ceil(customers_per_vehicle) + 1,
+    )
+
+
+def get_speed_classes(scenario: ScenarioColumns) -> tuple[list[float], list[int]]:
+    """Distinct vehicle speeds (m/s) and the speed class of every vehicle.
+
+    Vehicles without a (positive) speed drive at the provider's default speed.
+    """
+    speeds = scenario.vehicle_speed.astype(np.float64)
+    unknown = ~(speeds > 0)
+    speeds[unknown] = get_travel_time_provider().speed_in_m_per_sec
+    class_speeds, vehicle_classes = np.unique(speeds, return_inverse=True)
+    return class_speeds.tolist(), vehicle_classes.tolist()
+
+
+def create_vehicle_time_matrices(
+    scenario: ScenarioColumns, locations: np.ndarray
+) -> tuple[np.ndarray, list[int]]:
+    """One time matrix per speed class and the speed class of every vehicle."""
+    class_speeds, vehicle_classes = get_speed_classes(scenario)
+    return create_time_matrices(locations, class_speeds), vehicle_classes
+
+
+def get_greedy_routes(
+    scenario: ScenarioColumns,
+    time_matrix: np.ndarray,
+    vehicle_start_indeces: list[int],
+    capacity: int,
+    solve_for_shortest_path: bool = False,
+    vehicle_classes: list[int] | None = None,
+) -> tuple[list[list[int]], np.ndarray, np.ndarray]:
+    """Greedy routes (customer indices) that respect the model's constraints."""
+    pickup_nodes = 2 * np.arange(scenario.num_customers)
+    delivery_nodes = pickup_nodes + 1
+    routes = greedy_routes(
+        time_matrix,
+        pickup_nodes,
+        delivery_nodes,
+        vehicle_start_indeces,
+        [(capacity - 1) // 2] * scenario.num_vehicles,
+        solve_for_shortest_path,
+        vehicle_classes,
+    )
+    return routes, pickup_nodes, delivery_nodes
+
+
+def routes_to_customer_ids(
+    scenario: ScenarioColumns, routes: list[list[int]]
+) -> dict[str, list[str]]:
+    """Convert routes from customer indices to customer IDs per vehicle ID."""
+    customer_ids = scenario.customer_ids.tolist()
+    return {
+        vehicle_id: [customer_ids[customer] for customer in route]
+        for vehicle_id, route in zip(scenario.vehicle_ids.tolist(), routes)
+    }
+
+
+def get_greedy_solution(
+    scenario: Scenario | ScenarioColumns,
     hub_coords: tuple[float, float] | None,
     solve_for_shortest_path: bool = False,
-    max_solv_time_in_sec: int = 10,
-) -> tuple[dict[int, list[int]], int]:
+):
+    """Plan in milliseconds without OR-Tools, shaped like get_routing_solution."""
     start_time = time.perf_counter()
-    locations, precedence_pairs = process_customers(scenario)
-
-    num_cars = len(scenario.vehicles)
+    scenario = as_columns(scenario)
+    locations, _, vehicle_start_indeces, _ = build_locations(scenario, hub_coords)
+    time_matrices, vehicle_classes = create_vehicle_time_matrices(scenario, locations)
+    routes, pickup_nodes, delivery_nodes = get_greedy_routes(
+        scenario,
+        time_matrices,
+        vehicle_start_indeces,
+        get_vehicle_capacity(scenario),
+        solve_for_shortest_path,
+        vehicle_classes,
+    )
+    route_times, max_travel_time = evaluate_routes(
+        time_matrices,
+        routes,
+        pickup_nodes,
+        delivery_nodes,
+        vehicle_start_indeces,
+        vehicle_classes,
+    )
+    car_routes = routes_to_customer_ids(scenario, routes)
+    elapsed_time = time.perf_counter() - start_time
+    return (car_routes, int(route_times.sum()), max_travel_time, elapsed_time)
 
-    vehicle_start_indeces = []
-    for vehicle in scenario.vehicles:
-        start_car_coords = (vehicle.coordX, vehicle.coordY)
-        locations.append(start_car_coords)
-        vehicle_start_indeces.append(len(locations) - 1)
 
-    vehicle_end_indeces = []
-    for vehicle in scenario.vehicles:
-        if hub_coords:
-            end_car_coords = hub_coords
-        else:
-            end_car_coords = (vehicle.coordX, vehicle.coordY)
-        locations.append(end_car_coords)
-        vehicle_end_indeces.append(len(locations) - 1)
+def get_routing_solution(
+    scenario: Scenario | ScenarioColumns,
+    hub_coords: tuple[float, float] | None,
+    solve_for_shortest_path: bool = False,
+    max_solv_time_in_sec: float = 10,
+    initial_routes: dict[str, list[str]] | None = None,
+    verbose: bool = False,
+    on_solution: Callable[[dict], bool | None] | None = None,
+    should_stop: Callable[[], bool] | None = None,
+    num_neighbours: int | None = NUM_NEIGHBOURS,
+    greedy_start: bool = False,
+    first_solution_strategy: str = "PATH_CHEAPEST_ARC",
+    local_search_metaheuristic: str = "AUTOMATIC",
+    profile: SolverProfile | None = None,
+    vehicle_start_times: list[int] | None = None,
+    greedy_fallback: bool = True,
+) -> tuple[dict[str, list[str]], int]:
+    start_time = time.perf_counter()
+    scenario = as_columns(scenario)
+    if profile is None:
+        profile = get_profile(
+            scenario.num_vehicles, scenario.num_customers, solve_for_shortest_path
+        )
+    trace = SolveTrace(scenario.id, scenario.num_vehicles, scenario.num_customers)
+    with trace.phase("locations"):
+        locations, node_customer_ids, vehicle_start_indeces, vehicle_end_indeces = (
+            build_locations(scenario, hub_coords)
+        )
+    num_cars = scenario.num_vehicles
 
     # locations.append((0, 0))
     # dummy_end = len(locations) - 1
     # len(locations), num_cars, vehicle_indices, [dummy_end] * num_cars
-    manager = pywrapcp.RoutingIndexManager(
-        len(locations), num_cars, vehicle_start_indeces, vehicle_end_indeces
-    )
-    routing = pywrapcp.RoutingModel(manager)
+    with trace.phase("model"):
+        manager = pywrapcp.RoutingIndexManager(
+            len(locations), num_cars, vehicle_start_indeces, vehicle_end_indeces
+        )
+        routing = pywrapcp.RoutingModel(manager)
 
-    time_callback_index = create_time_dimension(routing, manager, locations)
+    # Vehicles of the same speed share one precomputed matrix
+    with trace.phase("time_matrix"):
+        time_matrices, vehicle_classes = create_vehicle_time_matrices(
+            scenario, locations
+        )
+    with trace.phase("time_dimension"):
+        time_callback_indices = create_time_dimension(
+            routing, manager, time_matrices, vehicle_classes, vehicle_start_times
+        )
 
     pickup_indices = []
     delivery_indices = []
 
-    for customer_index in range(len(scenario.customers)):
+    for customer_index in range(scenario.num_customers):
         pickup_indices.append(2 * customer_index)
         delivery_indices.append(2 * customer_index + 1)
 
-    add_pickup_delivery_constraints(routing, zip(pickup_indices, delivery_indices))
+    with trace.phase("pickup_delivery"):
+        add_pickup_delivery_constraints(routing, zip(pickup_indices, delivery_indices))
 
-    print(len(scenario.customers))
+    if verbose:
+        print(scenario.num_customers)
 
-    number_of_customers_per_car = math.ceil(len(scenario.customers) / num_cars * 3)
-    add_max_overall_capacity_per_vehicle(
-        routing, [number_of_customers_per_car] * num_cars
+    number_of_customers_per_car = get_vehicle_capacity(
+        scenario, profile.capacity_factor
     )
+    if initial_routes is None and greedy_start and scenario.num_customers:
+        with trace.phase("greedy_start"):
+            routes, _, _ = get_greedy_routes(
+                scenario,
+                time_matrices,
+                vehicle_start_indeces,
+                number_of_customers_per_car,
+                solve_for_shortest_path,
+                vehicle_classes,
+            )
+        initial_routes = routes_to_customer_ids(scenario, routes)
+    if initial_routes:
+        # The warm start has to fit (start node plus two nodes per customer),
+        # otherwise ReadAssignmentFromRoutes rejects it
+        longest_route = max(len(route) for route in initial_routes.values())
+        number_of_customers_per_car = max(
+            number_of_customers_per_car, 2 * longest_route + 1
+        )
+    with trace.phase("capacity"):
+        add_max_overall_capacity_per_vehicle(
+            routing, manager, [number_of_customers_per_car] * num_cars
+        )
 
-    if solve_for_shortest_path:
-        minimize_total_travel_time(routing, time_callback_index)
-    else:
-        minimize_largest_end_time(routing, time_callback_index)
+    with trace.phase("objective"):
+        span_cost_coefficient = profile.span_cost_coefficient(solve_for_shortest_path)
+        if solve_for_shortest_path:
+            minimize_total_travel_time(
+                routing, time_callback_indices, span_cost_coefficient
+            )
+        else:
+            minimize_largest_end_time(
+                routing, time_callback_indices, span_cost_coefficient
+            )
 
-    set_penalty_for_waiting_at_start(routing)
+    with trace.phase("waiting_time"):
+        set_penalty_for_waiting_at_start(routing, profile.waiting_time_coefficient)
+
+    routing.AddAtSolutionCallback(
+        lambda: trace.record_objective(routing.CostVar().Value())
+    )
+    if on_solution is not None or should_stop is not None:
+        add_solution_callback(
+            routing,
+            manager,
+            scenario,
+            node_customer_ids,
+            start_time,
+            on_solution,
+            should_stop,
+        )
 
     search_parameters = pywrapcp.DefaultRoutingSearchParameters()
-    search_parameters.first_solution_strategy = (
-        routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
+    search_parameters.first_solution_strategy = getattr(
+        routing_enums_pb2.FirstSolutionStrategy, first_solution_strategy
     )
     
     # Use simulated annealing for better local search
-    search_parameters.local_search_metaheuristic = (
-        routing_enums_pb2.LocalSearchMetaheuristic.AUTOMATIC
+    search_parameters.local_search_metaheuristic = getattr(
+        routing_enums_pb2.LocalSearchMetaheuristic, local_search_metaheuristic
     )
     # GUIDED_LOCAL_SEARCH not good -> slow
     
     # !!!!!!!! adjust -> thinks longer, but result is better
-    search_parameters.time_limit.seconds = max_solv_time_in_sec
+    if num_neighbours:
+        # Local search operators only consider each node's closest nodes
+        # (by arc cost) instead of every O(n^2) move
+        search_parameters.ls_operator_neighbors_ratio = min(
+            1.0, num_neighbours / len(locations)
+        )
+        search_parameters.ls_operator_min_neighbors = num_neighbours
+    search_parameters.time_limit.FromMilliseconds(int(max_solv_time_in_sec * 1000))
     # search_parameters.log_search = True
-    solution = routing.SolveWithParameters(search_parameters)
+    initial_assignment = None
+    if initial_routes is not None:
+        with trace.phase("warm_start"):
+            routing.CloseModelWithParameters(search_parameters)
+            initial_assignment = routing.ReadAssignmentFromRoutes(
+                get_nodes_from_customer_ids(initial_routes, scenario, manager),
+                True,
+            )
+    with trace.search():
+        if initial_assignment:
+            solution = routing.SolveFromAssignmentWithParameters(
+                initial_assignment, search_parameters
+            )
+        else:
+            solution = routing.SolveWithParameters(search_parameters)
 
     end_time = time.perf_counter()
     elapsed_time = end_time - start_time
-    # Display the solution
     if solution:
-        car_routes = {}
-        total_time = 0
-        time_dimension = routing.GetDimensionOrDie("Time")
-        travel_time_per_car = []
+        with trace.phase("extraction"):
+            solution_rows = extract_solution(routing, manager, solution, verbose)
+            visited = solution_rows[~solution_rows["is_end"]]
+            # Start cumuls are fixed (to zero, or to the end of a committed
+            # trip), so a route's time is the arrival at its last node
+            route_times = np.zeros(num_cars, dtype=np.int64)
+            np.maximum.at(route_times, visited["vehicle"], visited["arrival"])
+            total_time = int(route_times.sum())
+            if verbose:
+                print(f"Total time for all routes: {total_time}")
 
-        for vehicle_id in range(num_cars):
-            index = routing.Start(vehicle_id)
-            route_text = [f"Route for vehicle {vehicle_id}:"]
-            route = []
-            route_time = 0
+            # Every vehicle has at least a start and an end row
+            vehicle_routes = np.split(
+                solution_rows["node"],
+                np.flatnonzero(np.diff(solution_rows["vehicle"])) + 1,
+            )
+            car_routes = {
+                vehicle_id: route.tolist()
+                for vehicle_id, route in enumerate(vehicle_routes)
+            }
+            car_routes_with_ids = get_list_of_customer_ids_from_nodes(
+                car_routes, node_customer_ids, scenario
+            )
+        trace.finish("solved")
+        return (
+            car_routes_with_ids,
+            total_time,
+            int(visited["arrival"].max()),
+            elapsed_time,
+        )
+    elif scenario.num_customers and greedy_fallback:
+        # Better a greedy plan than none at all
+        print("No solution found, falling back to the greedy plan.")
+        with trace.phase("greedy_fallback"):
+            result = get_greedy_solution(scenario, hub_coords, solve_for_shortest_path)
+        trace.finish("greedy_fallback")
+        return result
+    else:
+        trace.finish("failed")
+        raise NoSolutionError("No solution found.")
 
-            while not routing.IsEnd(index):
-                node_index = manager.IndexToNode(index)
-                route.append(node_index)
-                time_var = time_dimension.CumulVar(index)
-                route_text.append(f"Node {node_index} Time({solution.Min(time_var)})")
-                travel_time_per_car.append(solution.Min(time_var))
-                next_index = solution.Value(routing.NextVar(index))
-                if not routing.IsEnd(next_index):
-                    # Calculate the travel time to the next node
-                    travel_time = solution.Min(
-                        time_dimension.CumulVar(next_index)
-                    ) - solution.Min(time_var)
-                    route_time += travel_time
-                index = next_index
-
-            # Add the end node
-            end_time_var = time_dimension.CumulVar(index)
-            route_text.append(f"End Time({solution.Min(end_time_var)})")
-            route_text.append(f"Route time: {route_time}")
-            total_time += route_time
-            route.append(manager.IndexToNode(index))
-            car_routes[vehicle_id] = route
 
-            # Print the route
-            # print("\n".join(route_text))
-            print()  # Blank line between vehicle routes
+def get_routing_solution_or_greedy(
+    scenario: Scenario | ScenarioColumns,
+    hub_coords: tuple[float, float] | None,
+    solve_for_shortest_path: bool = False,
+    max_solv_time_in_sec: float = 10,
+    **options,
+) -> tuple[tuple, bool]:
+    """get_routing_solution and whether its result is the greedy fallback plan.
 
-        print(f"Total time for all routes: {total_time}")
-        car_routes_with_ids = get_list_of_customer_ids_from_nodes(
-            car_routes, locations, scenario
+    Fallback plans are a stopgap, callers should not cache them.
+    """
+    try:
+        result = get_routing_solution(
+            scenario,
+            hub_coords,
+            solve_for_shortest_path,
+            max_solv_time_in_sec,
+            greedy_fallback=False,
+            **options,
         )
-        return (car_routes_with_ids, total_time, max(travel_time_per_car), elapsed_time)
-    else:
-        raise ValueError("No solution found.")
+    except NoSolutionError:
+        if not as_columns(scenario).num_customers:
+            raise
+        print("No solution found, falling back to the greedy plan.")
+        return get_greedy_solution(scenario, hub_coords, solve_for_shortest_path), True
+    return result, False
 
 
 if __name__ == "__main__":
     scenario = Scenario.parse_file((Path(__file__).parent / "example.json"))
-    get_routing_solution(scenario)
+    get_routing_solution(scenario, None, verbose=True)
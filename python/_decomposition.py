@@ -0,0 +1,92 @@
+import math
+import os
+
+import numpy as np
+
+from scenario_model import Scenario
+from _scenario_columns import ScenarioColumns, as_columns
+
+# Above this many customers a single RoutingModel does not fit the time budget
+DECOMPOSE_THRESHOLD = int(os.environ.get("DECOMPOSE_THRESHOLD", 300))
+CUSTOMERS_PER_CLUSTER = int(os.environ.get("CUSTOMERS_PER_CLUSTER", 150))
+
+
+def kmeans(
+    points: np.ndarray, n_clusters: int, n_iter: int = 25, seed: int = 0
+) -> tuple[np.ndarray, np.ndarray]:
+    """Plain Lloyd's k-means, returns (labels, centroids)."""
+    rng = np.random.default_rng(seed)
+    centroids = points[rng.choice(len(points), n_clusters, replace=False)]
+    for _ in range(n_iter):
+        distances = ((points[:, np.newaxis, :] - centroids[np.newaxis]) ** 2).sum(-1)
+        labels = distances.argmin(axis=1)
+        counts = np.bincount(labels, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, points)
+        new_centroids = np.where(
+            counts[:, np.newaxis] > 0,
+            sums / np.maximum(counts, 1)[:, np.newaxis],
+            centroids,
+        )
+        if np.allclose(new_centroids, centroids):
+            break
+        centroids = new_centroids
+    return labels, centroids
+
+
+def split_scenario(
+    scenario: Scenario | ScenarioColumns, n_clusters: int | None = None
+) -> list[ScenarioColumns]:
+    """Partition the customers by pickup location and give each part nearby vehicles.
+
+    Every part gets at least one vehicle and vehicles are shared out in
+    proportion to the number of customers in the part.
+    """
+    scenario = as_columns(scenario)
+    num_cars = scenario.num_vehicles
+    if n_clusters is None:
+        n_clusters = math.ceil(scenario.num_customers / CUSTOMERS_PER_CLUSTER)
+    n_clusters = min(n_clusters, num_cars, scenario.num_customers)
+    if n_clusters <= 1:
+        return [scenario]
+
+    labels, centroids = kmeans(scenario.customer_coords, n_clusters)
+    # Drop clusters that ended up empty
+    used = np.unique(labels)
+    labels = np.searchsorted(used, labels)
+    centroids = centroids[used]
+    n_clusters = len(used)
+
+    sizes = np.bincount(labels, minlength=n_clusters)
+    quota = np.maximum(1, np.floor(sizes / sizes.sum() * num_cars)).astype(int)
+    while quota.sum() > num_cars:
+        quota[np.argmax(quota)] -= 1
+    while quota.sum() < num_cars:
+        quota[np.argmax(sizes / quota)] += 1
+
+    # Hand out vehicles to clusters, closest pairs first
+    vehicle_coords = scenario.vehicle_coords
+    distances = ((vehicle_coords[:, np.newaxis] - centroids[np.newaxis]) ** 2).sum(-1)
+    vehicle_cluster = np.full(num_cars, -1)
+    for flat_index in np.argsort(distances, axis=None):
+        vehicle, cluster = divmod(int(flat_index), n_clusters)
+        if vehicle_cluster[vehicle] == -1 and quota[cluster] > 0:
+            vehicle_cluster[vehicle] = cluster
+            quota[cluster] -= 1
+
+    return [
+        scenario.subset(
+            vehicles=vehicle_cluster == cluster, customers=labels == cluster
+        )
+        for cluster in range(n_clusters)
+    ]
+
+
+def merge_solutions(results: list[tuple], elapsed_time: float) -> tuple:
+    """Stitch the per-cluster results into one get_routing_solution result."""
+    car_routes = {}
+    for sub_routes, *_ in results:
+        car_routes.update(sub_routes)
+    total_time = sum(result[1] for result in results)
+    max_travel_time = max(result[2] for result in results)
+    return (car_routes, total_time, max_travel_time, elapsed_time)
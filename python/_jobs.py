@@ -0,0 +1,230 @@
+from collections import OrderedDict
+from typing import Callable
+import asyncio
+import json
+import multiprocessing
+import queue
+import time
+import uuid
+
+from scenario_model import Scenario
+from _scenario_columns import ScenarioColumns
+from _create_route import get_routing_solution
+from _solver_pool import solver_pool
+
+# How often running jobs check their progress queue
+PROGRESS_POLL_INTERVAL_IN_SEC = 0.05
+
+
+def solve_with_progress(
+    progress_queue,
+    cancel_event,
+    scenario: Scenario | ScenarioColumns,
+    hub_coords: tuple[float, float] | None,
+    solve_for_shortest_path: bool | None,
+    max_solv_time_in_sec: float,
+):
+    """Runs in a solver worker and forwards every better solution to the queue."""
+
+    return get_routing_solution(
+        scenario,
+        hub_coords,
+        solve_for_shortest_path,
+        max_solv_time_in_sec,
+        on_solution=progress_queue.put,
+        should_stop=cancel_event.is_set,
+    )
+
+
+class SolveJob:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.created_at = time.time()
+        self.solutions: list[dict] = []
+        self.result: tuple | None = None
+        self.error: str | None = None
+        # Cancelling may come before the solve has its cancel_event
+        self.cancel_requested = False
+        self.cancel_event = None
+        self.task: asyncio.Task | None = None
+        self._condition = asyncio.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "cancelled", "failed")
+
+    def summary(self) -> dict:
+        result = None
+        if self.result is not None:
+            car_routes, total_time, max_travel_time, elapsed_time = self.result
+            result = {
+                "car_routes": car_routes,
+                "time_algo_took_in_sec": elapsed_time,
+                "overall_car_usage_in_sec": total_time,
+                "last_customer_at_destination_in_sec": max_travel_time,
+            }
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "solutions_found": len(self.solutions),
+            "best_solution": self.solutions[-1] if self.solutions else None,
+            "result": result,
+            "error": self.error,
+        }
+
+    async def notify(self):
+        async with self._condition:
+            self._condition.notify_all()
+
+    async def events(self):
+        """Server-sent events: one per better solution, then the final status."""
+        sent = 0
+        while True:
+            while sent < len(self.solutions):
+                yield _sse("solution", self.solutions[sent])
+                sent += 1
+            if self.done:
+                yield _sse(self.status, self.summary())
+                return
+            async with self._condition:
+                await self._condition.wait_for(
+                    lambda: len(self.solutions) > sent or self.done
+                )
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class JobStore:
+    """Keeps track of asynchronous solve jobs and their progress."""
+
+    def __init__(self, max_jobs: int = 1000):
+        self.max_jobs = max_jobs
+        self._jobs: OrderedDict[str, SolveJob] = OrderedDict()
+        self._manager = None
+
+    @property
+    def manager(self):
+        # Queues and events shared with the solver worker processes
+        if self._manager is None:
+            self._manager = multiprocessing.get_context("spawn").Manager()
+        return self._manager
+
+    def get(self, job_id: str) -> SolveJob | None:
+        return self._jobs.get(job_id)
+
+    def submit(
+        self,
+        scenario: Scenario | ScenarioColumns,
+        hub_coords: tuple[float, float] | None,
+        solve_for_shortest_path: bool | None,
+        max_solv_time_in_sec: float,
+        on_completed: Callable[[tuple], None] | None = None,
+    ) -> SolveJob:
+        job = SolveJob()
+        self._jobs[job.id] = job
+        self._evict()
+        job.task = asyncio.create_task(
+            self._run(
+                job,
+                scenario,
+                hub_coords,
+                solve_for_shortest_path,
+                max_solv_time_in_sec,
+                on_completed,
+            )
+        )
+        return job
+
+    def cancel(self, job_id: str) -> SolveJob | None:
+        job = self._jobs.get(job_id)
+        if job is not None and not job.done:
+            job.cancel_requested = True
+            if job.cancel_event is not None:
+                job.cancel_event.set()
+        return job
+
+    def shutdown(self):
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+    async def _run(
+        self,
+        job: SolveJob,
+        scenario: Scenario | ScenarioColumns,
+        hub_coords,
+        solve_for_shortest_path,
+        max_solv_time_in_sec,
+        on_completed,
+    ):
+        # Starting the manager and creating its proxies are blocking IPC calls
+        progress_queue, job.cancel_event = await asyncio.to_thread(
+            lambda: (self.manager.Queue(), self.manager.Event())
+        )
+        if job.cancel_requested:
+            # Cancelled while queued, before there was an event to set
+            job.status = "cancelled"
+            await job.notify()
+            return
+        solved = asyncio.Event()
+        drain = asyncio.create_task(self._drain(job, progress_queue, solved))
+        job.status = "running"
+        await job.notify()
+        try:
+            result = await solver_pool.submit(
+                solve_with_progress,
+                progress_queue,
+                job.cancel_event,
+                scenario,
+                hub_coords,
+                solve_for_shortest_path,
+                max_solv_time_in_sec,
+            )
+            status = "cancelled" if job.cancel_event.is_set() else "completed"
+        except Exception as exc:
+            result, status = None, "failed"
+            job.error = str(exc)
+        # All progress from the worker is queued before its result arrives
+        solved.set()
+        await drain
+        job.result = result
+        job.status = status
+        await job.notify()
+        if on_completed is not None and status == "completed":
+            on_completed(result)
+
+    async def _drain(self, job: SolveJob, progress_queue, solved: asyncio.Event):
+        """Poll the progress queue until the solve is over and the queue empty.
+
+        Polling does not block a thread per job, which would use up the
+        default executor that asyncio.to_thread callers share.
+        """
+        while True:
+            last_poll = solved.is_set()
+            found = False
+            while True:
+                try:
+                    progress = progress_queue.get_nowait()
+                except queue.Empty:
+                    break
+                job.solutions.append(progress)
+                found = True
+            if found:
+                await job.notify()
+            if last_poll:
+                return
+            try:
+                await asyncio.wait_for(solved.wait(), PROGRESS_POLL_INTERVAL_IN_SEC)
+            except asyncio.TimeoutError:
+                pass
+
+    def _evict(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[: max(len(self._jobs) - self.max_jobs, 0)]:
+            del self._jobs[job_id]
+
+
+job_store = JobStore()
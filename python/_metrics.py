@@ -0,0 +1,231 @@
+from collections import deque
+from contextlib import contextmanager
+import bisect
+import threading
+import time
+
+# Histogram buckets in seconds, from dispatcher round trips to long searches
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+METRICS = {
+    "solver_solve_seconds": ("histogram", "Wall time of get_routing_solution."),
+    "solver_phase_seconds": ("histogram", "Wall time per solver phase."),
+    "solver_solves_total": ("counter", "Solves by how the plan was found."),
+    "solver_solutions_total": ("counter", "Improving solutions found by the search."),
+    "scenario_fetch_seconds": ("histogram", "Time to fetch and parse a scenario."),
+    "dispatcher_poll_seconds": ("histogram", "Round trip of a dispatcher poll."),
+    "dispatcher_poll_failures_total": ("counter", "Dispatcher polls that failed."),
+    "dispatcher_replan_seconds": ("histogram", "Time to replan in the dispatcher."),
+    "dispatcher_update_seconds": ("histogram", "Round trip of a dispatcher update."),
+    "dispatcher_update_failures_total": ("counter", "Dispatcher updates that failed."),
+    "dispatcher_tick_seconds": (
+        "histogram",
+        "From poll response to acknowledged assignments, per dispatcher tick.",
+    ),
+    "solver_pool_pending": ("gauge", "Solves running or queued in the solver pool."),
+    "solver_pool_warm_up_seconds": (
+        "gauge",
+        "Time to spawn and warm up every solver worker.",
+    ),
+    "solution_cache_hits_total": ("counter", "Solution cache hits."),
+    "solution_cache_misses_total": ("counter", "Solution cache misses."),
+}
+
+
+def _label_key(labels: dict) -> tuple[tuple[str, str], ...]:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class MetricsRegistry:
+    """Counters, gauges and histograms of this process in the Prometheus text format.
+
+    Solver worker processes record into their own registry and ship it to the
+    server with drain() and merge(), see call_with_metrics.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS, max_traces=20):
+        self.buckets = buckets
+        self.traces: deque[dict] = deque(maxlen=max_traces)
+        self._values: dict[tuple[str, tuple], float] = {}
+        self._histograms: dict[tuple[str, tuple], list] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._values[(name, _label_key(labels))] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.setdefault(
+                key, [[0] * len(self.buckets), 0.0, 0]
+            )
+            bucket = bisect.bisect_left(self.buckets, value)
+            if bucket < len(self.buckets):
+                histogram[0][bucket] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def add_trace(self, trace: dict):
+        with self._lock:
+            self.traces.append(trace)
+
+    def recent_traces(self) -> list[dict]:
+        with self._lock:
+            return list(self.traces)
+
+    def drain(self) -> dict:
+        """Return everything recorded so far and start from scratch."""
+        with self._lock:
+            state = {
+                "values": self._values,
+                "histograms": self._histograms,
+                "traces": list(self.traces),
+            }
+            self._values = {}
+            self._histograms = {}
+            self.traces.clear()
+        return state
+
+    def merge(self, state: dict):
+        """Add the counters, histograms and traces drained from another process."""
+        with self._lock:
+            for key, value in state["values"].items():
+                if METRICS.get(key[0], ("counter",))[0] == "gauge":
+                    self._values[key] = value
+                else:
+                    self._values[key] = self._values.get(key, 0) + value
+            for key, (bucket_counts, total, count) in state["histograms"].items():
+                histogram = self._histograms.setdefault(
+                    key, [[0] * len(self.buckets), 0.0, 0]
+                )
+                histogram[0] = [a + b for a, b in zip(histogram[0], bucket_counts)]
+                histogram[1] += total
+                histogram[2] += count
+            self.traces.extend(state["traces"])
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            names = sorted(
+                {name for name, _ in self._values}
+                | {name for name, _ in self._histograms}
+            )
+            for name in names:
+                kind, help_text = METRICS.get(name, ("untyped", name))
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for (metric, labels), value in sorted(self._values.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+                for (metric, labels), histogram in sorted(self._histograms.items()):
+                    if metric == name:
+                        lines += self._render_histogram(name, labels, *histogram)
+        return "\n".join(lines) + "\n"
+
+    def _render_histogram(self, name, labels, bucket_counts, total, count) -> list:
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, bucket_counts):
+            cumulative += bucket_count
+            bucket_labels = _format_labels(labels + (("le", str(bound)),))
+            lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+        lines.append(
+            f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}"
+        )
+        lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+        lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+metrics = MetricsRegistry()
+
+
+class SolveTrace:
+    """Phase timings and objective-versus-time of one solve."""
+
+    def __init__(self, scenario_id: str, num_vehicles: int, num_customers: int):
+        self.scenario_id = scenario_id
+        self.num_vehicles = num_vehicles
+        self.num_customers = num_customers
+        self.start_time = time.perf_counter()
+        self.phases: dict[str, float] = {}
+        # (seconds since the start, objective) of every improving solution
+        self.objectives: list[tuple[float, int]] = []
+        self._search_start: float | None = None
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + time.perf_counter() - start
+
+    @contextmanager
+    def search(self):
+        """Time the search, split at the first solution into its two phases."""
+        self._search_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            search_time = time.perf_counter() - self._search_start
+            first_solution_time = search_time
+            if self.objectives:
+                search_offset = self._search_start - self.start_time
+                first_solution_time = self.objectives[0][0] - search_offset
+            self.phases["first_solution"] = first_solution_time
+            self.phases["local_search"] = search_time - first_solution_time
+
+    def record_objective(self, objective: int):
+        if self.objectives and objective >= self.objectives[-1][1]:
+            return
+        self.objectives.append((time.perf_counter() - self.start_time, objective))
+
+    def finish(self, result: str):
+        """Record the trace in the metrics of this process."""
+        solve_time = time.perf_counter() - self.start_time
+        metrics.observe("solver_solve_seconds", solve_time)
+        for phase, seconds in self.phases.items():
+            metrics.observe("solver_phase_seconds", seconds, phase=phase)
+        metrics.inc("solver_solves_total", result=result)
+        metrics.inc("solver_solutions_total", len(self.objectives))
+        metrics.add_trace(
+            {
+                "scenario_id": self.scenario_id,
+                "vehicles": self.num_vehicles,
+                "customers": self.num_customers,
+                "result": result,
+                "solve_time_in_sec": solve_time,
+                "phases_in_sec": self.phases,
+                "objectives": self.objectives,
+            }
+        )
+
+
+def call_with_metrics(fn, *args, **kwargs) -> tuple:
+    """Run fn in a worker process and return its result with the worker's metrics."""
+    result = fn(*args, **kwargs)
+    return result, metrics.drain()
+
+
+def unwrap_metrics(result_and_metrics: tuple):
+    """Merge the metrics returned by call_with_metrics and return the result."""
+    result, state = result_and_metrics
+    metrics.merge(state)
+    return result
@@ -1,5 +1,8 @@
 from ortools.constraint_solver.pywrapcp import RoutingModel, RoutingIndexManager
 import math
+import numpy as np
+
+from _travel_time import TravelTimeProvider, get_travel_time_provider
 
 
 def euclidean_distance(coord1, coord2) -> int:
@@ -12,30 +15,61 @@ def euclidean_distance(coord1, coord2) -> int:
     return round(time_in_min)
 
 
+def create_time_matrix(
+    locations, provider: TravelTimeProvider | None = None
+) -> np.ndarray:
+    """Returns the node-to-node travel times in minutes.
+
+    Uses the provider configured by TRAVEL_TIME_PROVIDER unless one is given;
+    the default matches euclidean_distance.
+    """
+    return (provider or get_travel_time_provider()).time_matrix(locations)
+
+
+def create_time_matrices(
+    locations, speeds: list[float], provider: TravelTimeProvider | None = None
+) -> np.ndarray:
+    """Returns one travel time matrix in minutes per speed (in m/s)."""
+    return (provider or get_travel_time_provider()).time_matrices(locations, speeds)
+
+
 def create_time_dimension(
     routing: RoutingModel,
     manager: RoutingIndexManager,
-    locations,
-):
-    """Adds the time dimension to the routing model and returns it."""
-
-    def time_callback(from_index, to_index):
-        """Returns the travel time between the two nodes."""
-        # Convert from routing variable Index to actual node index
-        from_node = manager.IndexToNode(from_index)
-        to_node = manager.IndexToNode(to_index)
-        time = euclidean_distance(locations[from_node], locations[to_node])
-        return time
-
-    time_callback_index = routing.RegisterTransitCallback(time_callback)
-    routing.AddDimension(
-        time_callback_index,
-        slack_max=0,  # No slack time
-        capacity=10000,  # Maximum time allowed for each vehicle
-        fix_start_cumul_to_zero=True,
-        name="Time",
+    time_matrix: np.ndarray,
+    vehicle_classes: list[int] | None = None,
+    vehicle_start_times: list[int] | None = None,
+) -> list[int]:
+    """Adds the time dimension and returns the transit callback of every vehicle.
+
+    time_matrix is one (n, n) matrix for the whole fleet, or one matrix per
+    speed class with vehicle_classes giving the class of every vehicle.
+    Vehicles start at time 0, or at their vehicle_start_times (in minutes),
+    e.g. when they first have to finish a trip they are committed to.
+    """
+    time_matrices = time_matrix.reshape(-1, *time_matrix.shape[-2:])
+    if vehicle_classes is None:
+        vehicle_classes = [0] * routing.vehicles()
+    # The matrices are indexed by node and evaluated in C++, so no Python
+    # code runs for the arcs during the search, however many classes there are.
+    class_callback_indices = [
+        routing.RegisterTransitMatrix(matrix.tolist()) for matrix in time_matrices
+    ]
+    time_callback_indices = [
+        class_callback_indices[vehicle_class] for vehicle_class in vehicle_classes
+    ]
+    routing.AddDimensionWithVehicleTransits(
+        time_callback_indices,
+        0,  # No slack time
+        10000,  # Maximum time allowed for each vehicle
+        vehicle_start_times is None,  # Start cumul to zero
+        "Time",
     )
-    return time_callback_index
+    if vehicle_start_times is not None:
+        time_dimension = routing.GetDimensionOrDie("Time")
+        for vehicle, start in enumerate(vehicle_start_times):
+            time_dimension.CumulVar(routing.Start(vehicle)).SetValue(int(start))
+    return time_callback_indices
 
 
 def add_pickup_delivery_constraints(routing: RoutingModel, pickup_delivery_pairs):
@@ -57,14 +91,15 @@ def add_pickup_delivery_constraints(routing: RoutingModel, pickup_delivery_pairs
 
 
 def add_max_overall_capacity_per_vehicle(
-    routing: RoutingModel, vehicle_capacities: list[int]
+    routing: RoutingModel,
+    manager: RoutingIndexManager,
+    vehicle_capacities: list[int],
 ):
     """Adds the capacity dimension to the routing model."""
-
-    def demand_callback(index):
-        return 1
-
-    demand_callback_index = routing.RegisterUnaryTransitCallback(demand_callback)
+    # Every visited node counts as one unit of demand.
+    demand_callback_index = routing.RegisterUnaryTransitVector(
+        [1] * manager.GetNumberOfNodes()
+    )
     routing.AddDimensionWithVehicleCapacity(
         demand_callback_index,
         0,  # Null capacity slack
@@ -72,41 +107,49 @@ def add_max_overall_capacity_per_vehicle(
         True,  # Start cumul to zero
         "Capacity",
     )
-    # capacity_dimension = routing.GetDimensionOrDie("Capacity")
 
 
-def minimize_largest_end_time(routing: RoutingModel, time_callback_index: int):
+def set_arc_costs(routing: RoutingModel, time_callback_indices: list[int]):
+    """Each vehicle pays its own travel time for the arcs it drives."""
+    for vehicle, time_callback_index in enumerate(time_callback_indices):
+        routing.SetArcCostEvaluatorOfVehicle(time_callback_index, vehicle)
+
+
+def minimize_largest_end_time(
+    routing: RoutingModel,
+    time_callback_indices: list[int],
+    span_cost_coefficient: int = 20,
+):
     """Adds a time dimension and sets an objective to minimize the largest end time."""
-    routing.SetArcCostEvaluatorOfAllVehicles(time_callback_index)
+    set_arc_costs(routing, time_callback_indices)
     time_dimension = routing.GetDimensionOrDie("Time")
-    time_dimension.SetGlobalSpanCostCoefficient(20)
+    time_dimension.SetGlobalSpanCostCoefficient(span_cost_coefficient)
 
 
-def minimize_total_travel_time(routing: RoutingModel, time_callback_index: int):
+def minimize_total_travel_time(
+    routing: RoutingModel,
+    time_callback_indices: list[int],
+    span_cost_coefficient: int = 10,
+):
     """Set objective to minimize the total travel time."""
     # Set cost of travel for each arc (from -> to)
-    routing.SetArcCostEvaluatorOfAllVehicles(time_callback_index)
+    set_arc_costs(routing, time_callback_indices)
     time_dimension = routing.GetDimensionOrDie("Time")
-    time_dimension.SetGlobalSpanCostCoefficient(10)
-
-
-def set_penalty_for_waiting_at_start(routing: RoutingModel):
-    def waiting_time_callback(from_index, _):
-        """Return a penalty for waiting."""
-        # Waiting time is the time spent at the start without moving
-        return 0 if routing.IsEnd(from_index) else 1
+    time_dimension.SetGlobalSpanCostCoefficient(span_cost_coefficient)
 
-    waiting_time_index = routing.RegisterTransitCallback(waiting_time_callback)
 
-    # Add a waiting time dimension
-    routing.AddDimension(
-        waiting_time_index,
-        slack_max=0,  # No additional slack
-        capacity=10000,  # Large enough capacity
-        fix_start_cumul_to_zero=True,
-        name="WaitingTime",
+def set_penalty_for_waiting_at_start(
+    routing: RoutingModel, span_cost_coefficient: int = 100
+):
+    # Waiting time grows by one for every arc a vehicle drives; the end node
+    # has no outgoing arc, so a constant transit is all that is needed.
+    routing.AddConstantDimension(
+        1,
+        10000,  # Large enough capacity
+        True,  # Start cumul to zero
+        "WaitingTime",
     )
 
     # Penalize waiting time globally
     waiting_time_dimension = routing.GetDimensionOrDie("WaitingTime")
-    waiting_time_dimension.SetGlobalSpanCostCoefficient(100)
+    waiting_time_dimension.SetGlobalSpanCostCoefficient(span_cost_coefficient)
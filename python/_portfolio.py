@@ -0,0 +1,116 @@
+from collections import Counter
+import asyncio
+import time
+
+from scenario_model import Scenario
+from _scenario_columns import ScenarioColumns
+from _create_route import NoSolutionError, get_routing_solution
+from _solver_pool import solver_pool
+
+# (first solution strategy, local search metaheuristic, seed with greedy plan)
+# SAVINGS and LOCAL_CHEAPEST_ARC find no first solution when every delivery
+# has to follow its pickup directly, see test_portfolio.py
+DEFAULT_PORTFOLIO = [
+    ("PATH_CHEAPEST_ARC", "AUTOMATIC", False),
+    ("PATH_CHEAPEST_ARC", "GUIDED_LOCAL_SEARCH", True),
+    ("PARALLEL_CHEAPEST_INSERTION", "GUIDED_LOCAL_SEARCH", False),
+    ("LOCAL_CHEAPEST_INSERTION", "SIMULATED_ANNEALING", False),
+    ("PATH_CHEAPEST_ARC", "TABU_SEARCH", False),
+]
+
+# How often each configuration returned the best plan
+portfolio_wins: Counter[str] = Counter()
+
+
+def config_name(config: tuple[str, str, bool]) -> str:
+    first_solution_strategy, local_search_metaheuristic, greedy_start = config
+    name = f"{first_solution_strategy}/{local_search_metaheuristic}"
+    return f"{name}+GREEDY" if greedy_start else name
+
+
+def solve_config(
+    config: tuple[str, str, bool],
+    scenario: Scenario | ScenarioColumns,
+    hub_coords: tuple[float, float] | None,
+    solve_for_shortest_path: bool | None,
+    max_solv_time_in_sec: float,
+):
+    """Solve with one configuration of the portfolio.
+
+    Without the greedy fallback, a configuration that finds nothing fails
+    instead of competing with the greedy plan.
+    """
+    first_solution_strategy, local_search_metaheuristic, greedy_start = config
+    return get_routing_solution(
+        scenario,
+        hub_coords,
+        solve_for_shortest_path,
+        max_solv_time_in_sec,
+        greedy_start=greedy_start,
+        first_solution_strategy=first_solution_strategy,
+        local_search_metaheuristic=local_search_metaheuristic,
+        greedy_fallback=False,
+    )
+
+
+def pick_best(
+    portfolio: list[tuple[str, str, bool]],
+    results: list,
+    solve_for_shortest_path: bool | None,
+    elapsed_time: float,
+):
+    """Best result of the portfolio by the requested objective; failures are skipped."""
+    solved = [
+        (config, result)
+        for config, result in zip(portfolio, results)
+        if not isinstance(result, BaseException)
+    ]
+    if not solved:
+        # The most telling error, e.g. a crash rather than no solution
+        raise next(
+            (r for r in results if not isinstance(r, NoSolutionError)), results[0]
+        )
+
+    def score(config_and_result):
+        _, (_, total_time, max_travel_time, _) = config_and_result
+        if solve_for_shortest_path:
+            return (total_time, max_travel_time)
+        return (max_travel_time, total_time)
+
+    best_config, best_result = min(solved, key=score)
+    portfolio_wins[config_name(best_config)] += 1
+    scores = ", ".join(f"{config_name(c)}: {score((c, r))}" for c, r in solved)
+    print(f"Portfolio won by {config_name(best_config)} ({scores})")
+    car_routes, total_time, max_travel_time, _ = best_result
+    return (car_routes, total_time, max_travel_time, elapsed_time)
+
+
+async def get_portfolio_solution_async(
+    scenario: Scenario | ScenarioColumns,
+    hub_coords: tuple[float, float] | None,
+    solve_for_shortest_path: bool | None = False,
+    max_solv_time_in_sec: float = 10,
+    portfolio: list[tuple[str, str, bool]] = DEFAULT_PORTFOLIO,
+):
+    """Race the portfolio on the shared solver pool with the same time limit.
+
+    Raises NoSolutionError when no configuration found a solution.
+    """
+    start_time = time.perf_counter()
+    results = await asyncio.gather(
+        *(
+            solver_pool.submit(
+                solve_config,
+                config,
+                scenario,
+                hub_coords,
+                solve_for_shortest_path,
+                max_solv_time_in_sec,
+            )
+            for config in portfolio
+        ),
+        return_exceptions=True,
+    )
+    return pick_best(
+        portfolio, results, solve_for_shortest_path, time.perf_counter() - start_time
+    )
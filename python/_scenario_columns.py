@@ -0,0 +1,182 @@
+from dataclasses import dataclass, fields
+from pathlib import Path
+import json
+
+import numpy as np
+
+from scenario_model import Scenario
+
+ARRAY_FIELDS = (
+    "vehicle_ids",
+    "vehicle_coords",
+    "vehicle_available",
+    "vehicle_customer_ids",
+    "vehicle_remaining_travel_time",
+    "vehicle_speed",
+    "customer_ids",
+    "customer_coords",
+    "customer_destinations",
+    "customer_awaiting",
+)
+
+
+def _optional_float(value) -> float:
+    return np.nan if value is None else value
+
+
+@dataclass
+class ScenarioColumns:
+    """Column-oriented scenario: one NumPy array per vehicle/customer field.
+
+    Only the fields the solver and dispatcher read are kept (not the vehicle
+    statistics). Missing optional values are "" for ids and NaN for numbers.
+    """
+
+    id: str
+    status: str
+    start_time: str | None
+    end_time: str | None
+    vehicle_ids: np.ndarray
+    vehicle_coords: np.ndarray
+    vehicle_available: np.ndarray
+    vehicle_customer_ids: np.ndarray
+    vehicle_remaining_travel_time: np.ndarray
+    vehicle_speed: np.ndarray
+    customer_ids: np.ndarray
+    customer_coords: np.ndarray
+    customer_destinations: np.ndarray
+    customer_awaiting: np.ndarray
+
+    @property
+    def num_vehicles(self) -> int:
+        return len(self.vehicle_ids)
+
+    @property
+    def num_customers(self) -> int:
+        return len(self.customer_ids)
+
+    @classmethod
+    def from_json(cls, data: dict) -> "ScenarioColumns":
+        """Fast path for runner responses, without pydantic validation."""
+        vehicles = data["vehicles"]
+        customers = data["customers"]
+        return cls(
+            id=data["id"],
+            status=data["status"],
+            start_time=data.get("startTime"),
+            end_time=data.get("endTime"),
+            vehicle_ids=np.array([v["id"] for v in vehicles], dtype=str),
+            vehicle_coords=np.array(
+                [(v["coordX"], v["coordY"]) for v in vehicles], dtype=np.float64
+            ).reshape(-1, 2),
+            vehicle_available=np.array(
+                [v["isAvailable"] for v in vehicles], dtype=bool
+            ),
+            vehicle_customer_ids=np.array(
+                [v.get("customerId") or "" for v in vehicles], dtype=str
+            ),
+            vehicle_remaining_travel_time=np.array(
+                [_optional_float(v.get("remainingTravelTime")) for v in vehicles],
+                dtype=np.float64,
+            ),
+            vehicle_speed=np.array(
+                [_optional_float(v.get("vehicleSpeed")) for v in vehicles],
+                dtype=np.float64,
+            ),
+            customer_ids=np.array([c["id"] for c in customers], dtype=str),
+            customer_coords=np.array(
+                [(c["coordX"], c["coordY"]) for c in customers], dtype=np.float64
+            ).reshape(-1, 2),
+            customer_destinations=np.array(
+                [(c["destinationX"], c["destinationY"]) for c in customers],
+                dtype=np.float64,
+            ).reshape(-1, 2),
+            customer_awaiting=np.array(
+                [c["awaitingService"] for c in customers], dtype=bool
+            ),
+        )
+
+    @classmethod
+    def from_scenario(cls, scenario: Scenario) -> "ScenarioColumns":
+        return cls.from_json(scenario.dict())
+
+    def to_json(self) -> dict:
+        def optional(value):
+            return None if np.isnan(value) else float(value)
+
+        return {
+            "id": self.id,
+            "status": self.status,
+            "startTime": self.start_time,
+            "endTime": self.end_time,
+            "vehicles": [
+                {
+                    "id": str(self.vehicle_ids[i]),
+                    "coordX": float(self.vehicle_coords[i, 0]),
+                    "coordY": float(self.vehicle_coords[i, 1]),
+                    "isAvailable": bool(self.vehicle_available[i]),
+                    "customerId": str(self.vehicle_customer_ids[i]) or None,
+                    "remainingTravelTime": optional(
+                        self.vehicle_remaining_travel_time[i]
+                    ),
+                    "vehicleSpeed": optional(self.vehicle_speed[i]),
+                }
+                for i in range(self.num_vehicles)
+            ],
+            "customers": [
+                {
+                    "id": str(self.customer_ids[i]),
+                    "coordX": float(self.customer_coords[i, 0]),
+                    "coordY": float(self.customer_coords[i, 1]),
+                    "destinationX": float(self.customer_destinations[i, 0]),
+                    "destinationY": float(self.customer_destinations[i, 1]),
+                    "awaitingService": bool(self.customer_awaiting[i]),
+                }
+                for i in range(self.num_customers)
+            ],
+        }
+
+    def to_scenario(self) -> Scenario:
+        return Scenario.parse_obj(self.to_json())
+
+    def subset(self, vehicles=slice(None), customers=slice(None)) -> "ScenarioColumns":
+        """Copy with only the selected vehicles and customers (index or mask)."""
+        values = {field.name: getattr(self, field.name) for field in fields(self)}
+        for name in ARRAY_FIELDS:
+            selection = vehicles if name.startswith("vehicle_") else customers
+            values[name] = values[name][selection]
+        return ScenarioColumns(**values)
+
+    def save(self, path: str | Path):
+        """Write a snapshot directory: one .npy file per column plus meta.json."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        meta = {
+            "id": self.id,
+            "status": self.status,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+        }
+        (path / "meta.json").write_text(json.dumps(meta))
+        for name in ARRAY_FIELDS:
+            np.save(path / f"{name}.npy", getattr(self, name))
+
+    @classmethod
+    def load(cls, path: str | Path, mmap: bool = True) -> "ScenarioColumns":
+        """Read a snapshot; with mmap the columns are memory-mapped read-only."""
+        path = Path(path)
+        meta = json.loads((path / "meta.json").read_text())
+        mmap_mode = "r" if mmap else None
+        return cls(
+            **meta,
+            **{
+                name: np.load(path / f"{name}.npy", mmap_mode=mmap_mode)
+                for name in ARRAY_FIELDS
+            },
+        )
+
+
+def as_columns(scenario: Scenario | ScenarioColumns) -> ScenarioColumns:
+    if isinstance(scenario, ScenarioColumns):
+        return scenario
+    return ScenarioColumns.from_scenario(scenario)
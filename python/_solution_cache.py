@@ -0,0 +1,167 @@
+from collections import OrderedDict
+from dataclasses import asdict
+from pathlib import Path
+import copy
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+
+import numpy as np
+
+from scenario_model import Scenario
+from _metrics import metrics
+from _scenario_columns import ScenarioColumns, as_columns
+from _solver_profile import get_profile
+from _travel_time import get_travel_time_provider
+
+# Columns the solver result depends on
+KEY_COLUMNS = (
+    "vehicle_ids",
+    "vehicle_coords",
+    "vehicle_speed",
+    "customer_ids",
+    "customer_coords",
+    "customer_destinations",
+    "customer_awaiting",
+)
+
+
+def solution_cache_key(
+    scenario: Scenario | ScenarioColumns,
+    hub_coords: tuple[float, float] | None,
+    solve_for_shortest_path: bool | None,
+    max_solv_time_in_sec: float,
+    **options,
+) -> str:
+    """Hash of everything the solver result depends on.
+
+    This includes the tuned solver profile of the scenario's size class, so
+    plans found before a tuning run are not served afterwards. Extra solver
+    options only change the key when they are set.
+    """
+    columns = as_columns(scenario)
+    digest = hashlib.sha256()
+    for name in KEY_COLUMNS:
+        column = np.ascontiguousarray(getattr(columns, name))
+        digest.update(f"{name}:{column.dtype.str}:{column.shape}".encode())
+        digest.update(column.tobytes())
+    content = {
+        "hub_coords": hub_coords,
+        "solve_for_shortest_path": bool(solve_for_shortest_path),
+        "max_solv_time_in_sec": max_solv_time_in_sec,
+        "travel_time_provider": get_travel_time_provider().name,
+        "profile": asdict(
+            get_profile(
+                columns.num_vehicles, columns.num_customers, solve_for_shortest_path
+            )
+        ),
+    }
+    content.update({name: value for name, value in options.items() if value})
+    digest.update(json.dumps(content, separators=(",", ":")).encode())
+    return digest.hexdigest()
+
+
+class SolutionCache:
+    """LRU cache with a TTL for solver results, optionally persisted to disk.
+
+    The disk holds at most max_entries results as well; expired and evicted
+    results are deleted, and beyond that the least recently written ones.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 128,
+        ttl_in_sec: float = 3600,
+        cache_dir: str | Path | None = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_in_sec = ttl_in_sec
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._prune_disk()
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, tuple]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> tuple | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._read_from_disk(key)
+            if entry is None or time.time() - entry[0] > self.ttl_in_sec:
+                self._entries.pop(key, None)
+                if entry is not None:
+                    self._remove_from_disk(key)
+                self.misses += 1
+                metrics.inc("solution_cache_misses_total")
+                return None
+            self._store(key, entry)
+            self.hits += 1
+            metrics.inc("solution_cache_hits_total")
+            # Callers (e.g. the dispatcher) mutate the returned routes
+            return copy.deepcopy(entry[1])
+
+    def put(self, key: str, result: tuple):
+        entry = (time.time(), copy.deepcopy(result))
+        with self._lock:
+            self._store(key, entry)
+            if self.cache_dir:
+                path = self.cache_dir / f"{key}.pkl"
+                tmp_path = path.with_suffix(".tmp")
+                tmp_path.write_bytes(pickle.dumps(entry))
+                tmp_path.replace(path)
+                # Other processes may share the directory
+                self._prune_disk()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+    def _store(self, key: str, entry: tuple[float, tuple]):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted_key, _ = self._entries.popitem(last=False)
+            self._remove_from_disk(evicted_key)
+
+    def _read_from_disk(self, key: str) -> tuple[float, tuple] | None:
+        if not self.cache_dir:
+            return None
+        path = self.cache_dir / f"{key}.pkl"
+        try:
+            return pickle.loads(path.read_bytes())
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def _remove_from_disk(self, key: str):
+        if self.cache_dir:
+            (self.cache_dir / f"{key}.pkl").unlink(missing_ok=True)
+
+    def _prune_disk(self):
+        """Delete all but the max_entries most recently written results."""
+        paths = []
+        for path in self.cache_dir.glob("*.pkl"):
+            try:
+                paths.append((path.stat().st_mtime, path))
+            except OSError:
+                pass
+        paths.sort(reverse=True)
+        for _, path in paths[self.max_entries :]:
+            path.unlink(missing_ok=True)
+
+
+solution_cache = SolutionCache(
+    max_entries=int(os.environ.get("SOLUTION_CACHE_SIZE", 128)),
+    ttl_in_sec=float(os.environ.get("SOLUTION_CACHE_TTL", 3600)),
+    cache_dir=os.environ.get("SOLUTION_CACHE_DIR"),
+)
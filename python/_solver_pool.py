@@ -0,0 +1,189 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import asyncio
+import multiprocessing
+import os
+import time
+
+from _metrics import call_with_metrics, metrics, unwrap_metrics
+
+# Time limit of the tiny solve that warms up every new worker
+WARM_UP_TIME_IN_SEC = 0.5
+# How long start() waits for every worker to be warm
+START_TIMEOUT_IN_SEC = 300
+
+# Set in every worker by warm_up_worker
+_warm_barrier = None
+
+
+def warm_up_worker(warm_barrier):
+    """Load OR-Tools, the solver modules and the travel time data with a tiny
+    solve in a new worker.
+
+    Its timings would skew the solver metrics, so they are dropped.
+    """
+    global _warm_barrier
+    _warm_barrier = warm_barrier
+    from _create_route import get_routing_solution
+    from _travel_time import get_travel_time_provider
+    from synthetic_scenario import make_scenario
+
+    # e.g. the road graph and its cached distances, off the solve path
+    get_travel_time_provider().warm()
+    get_routing_solution(make_scenario(2, 4), None, False, WARM_UP_TIME_IN_SEC)
+    metrics.drain()
+
+
+def wait_for_warm_workers() -> int:
+    """Block until every worker of the pool runs this, and return the pid.
+
+    Tasks only run once the initializer has finished, so when the barrier
+    lets them through every worker is warm.
+    """
+    _warm_barrier.wait(START_TIMEOUT_IN_SEC)
+    return os.getpid()
+
+
+class SolverBusyError(RuntimeError):
+    """Raised when every solver worker is busy and the queue is full."""
+
+
+class SolverPool:
+    """Runs solves in worker processes and rejects work beyond a bounded queue."""
+
+    def __init__(self, max_workers: int, max_queued: int):
+        self.max_workers = max_workers
+        self.max_pending = max_workers + max_queued
+        self.pending = 0
+        # Every worker is spawned and warmed up, see start()
+        self.ready = False
+        self.warm_workers = 0
+        self._executor: ProcessPoolExecutor | None = None
+        self._restart: asyncio.Task | None = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawned workers do not inherit the server's threads and event loop
+            context = multiprocessing.get_context("spawn")
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=context,
+                initializer=warm_up_worker,
+                initargs=(context.Barrier(self.max_workers),),
+            )
+        return self._executor
+
+    async def start(self):
+        """Spawn and warm up every worker now instead of on the first solves."""
+        start_time = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        # Workers are spawned on demand, one per task no idle worker can take;
+        # the barrier keeps one worker from taking several of the tasks
+        pids = await asyncio.gather(
+            *(
+                loop.run_in_executor(self.executor, wait_for_warm_workers)
+                for _ in range(self.max_workers)
+            )
+        )
+        warm_up_time = time.perf_counter() - start_time
+        metrics.set_gauge("solver_pool_warm_up_seconds", warm_up_time)
+        self.warm_workers = len(set(pids))
+        print(f"Warmed up {self.warm_workers} solver workers in {warm_up_time:.1f}s.")
+        self.ready = self.warm_workers == self.max_workers
+
+    def is_saturated(self) -> bool:
+        return not self.can_admit()
+
+    def can_admit(self, count: int = 1) -> bool:
+        return self.pending + count <= self.max_pending
+
+    async def submit(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) in a worker process and return its result.
+
+        Metrics recorded in the worker are merged into this process.
+        """
+        return (await self.submit_all(fn, [args], **kwargs))[0]
+
+    async def submit_all(self, fn, calls: list[tuple], **kwargs) -> list:
+        """Run fn(*args, **kwargs) for every args in calls, each in a worker.
+
+        The calls take at most max_workers places in the pool; further calls
+        wait until one of them has finished, so any number of calls fits.
+        They are admitted together or not at all. When one fails, the calls
+        not finished yet are cancelled (running ones still take their place
+        until they are done) and the error is raised.
+        """
+        places = min(len(calls), self.max_workers)
+        if not self.can_admit(places):
+            raise SolverBusyError("All solver workers are busy, try again later.")
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        results = [loop.create_future() for _ in calls]
+        waiting = list(enumerate(calls))[::-1]
+        started = []
+
+        def start_next():
+            index, args = waiting.pop()
+            try:
+                future = executor.submit(call_with_metrics, fn, *args, **kwargs)
+            except BaseException as exc:
+                # e.g. the pool broke or shut down; that fails the whole call
+                results[index].set_exception(exc)
+                self._release()
+                return
+            started.append(future)
+            future.add_done_callback(
+                lambda _: loop.call_soon_threadsafe(finish, index, future)
+            )
+
+        def finish(index, future):
+            result = results[index]
+            # Results are cancelled once the call as a whole failed
+            if not result.done():
+                if future.cancelled():
+                    result.cancel()
+                elif future.exception() is not None:
+                    result.set_exception(future.exception())
+                else:
+                    result.set_result(future.result())
+            # The place goes straight to the next call, no other solve can
+            # take it in between
+            if waiting:
+                start_next()
+            else:
+                self._release()
+
+        self.pending += places
+        for _ in range(places):
+            start_next()
+        try:
+            values = await asyncio.gather(*results)
+        except BaseException as exc:
+            waiting.clear()
+            for future in started:
+                future.cancel()
+            for result in results:
+                result.cancel()
+            if isinstance(exc, BrokenProcessPool) and executor is self._executor:
+                # A worker died (e.g. out of memory); warm up a new pool once
+                self.shutdown()
+                self._restart = asyncio.create_task(self.start())
+            raise
+        return [unwrap_metrics(value) for value in values]
+
+    def _release(self):
+        self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self.ready = False
+        self.warm_workers = 0
+
+
+solver_pool = SolverPool(
+    max_workers=int(os.environ.get("SOLVER_WORKERS", os.cpu_count() or 1)),
+    max_queued=int(os.environ.get("SOLVER_QUEUE_SIZE", 16)),
+)
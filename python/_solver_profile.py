@@ -0,0 +1,131 @@
+from dataclasses import asdict, dataclass
+from pathlib import Path
+import json
+import math
+import os
+import threading
+
+
+@dataclass(frozen=True)
+class SolverProfile:
+    """Load balancing and objective weights of the routing model.
+
+    capacity_factor caps every vehicle at capacity_factor times its fair share
+    of nodes; the coefficients weight the global spans of the Time dimension
+    (per objective) and of the WaitingTime dimension.
+    """
+
+    capacity_factor: float = 3.0
+    makespan_span_coefficient: int = 20
+    total_time_span_coefficient: int = 10
+    waiting_time_coefficient: int = 100
+
+    def span_cost_coefficient(self, solve_for_shortest_path: bool | None) -> int:
+        if solve_for_shortest_path:
+            return self.total_time_span_coefficient
+        return self.makespan_span_coefficient
+
+
+# The hand-picked values the solver always used
+DEFAULT_PROFILE = SolverProfile()
+
+
+def size_class(num_vehicles: int, num_customers: int) -> str:
+    """Power-of-two buckets of the customer count and customers per vehicle."""
+    customers = 2 ** math.ceil(math.log2(max(num_customers, 1)))
+    per_vehicle = 2 ** math.ceil(math.log2(max(num_customers / num_vehicles, 1)))
+    return f"c{customers}-r{per_vehicle}"
+
+
+def profile_key(
+    num_vehicles: int, num_customers: int, solve_for_shortest_path: bool | None
+) -> str:
+    objective = "shortest" if solve_for_shortest_path else "makespan"
+    return f"{size_class(num_vehicles, num_customers)}/{objective}"
+
+
+class ProfileStore:
+    """Tuned profiles by size class and objective, kept in a JSON file.
+
+    Solver workers are separate processes, so the file is re-read whenever
+    another process has written it.
+    """
+
+    def __init__(self, path: str | Path | None):
+        self.path = Path(path) if path else None
+        self._profiles: dict[str, dict] = {}
+        self._mtime: float | None = None
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        num_vehicles: int,
+        num_customers: int,
+        solve_for_shortest_path: bool | None,
+    ) -> SolverProfile | None:
+        key = profile_key(num_vehicles, num_customers, solve_for_shortest_path)
+        with self._lock:
+            self._reload()
+            entry = self._profiles.get(key)
+        return SolverProfile(**entry["profile"]) if entry else None
+
+    def put(
+        self,
+        num_vehicles: int,
+        num_customers: int,
+        solve_for_shortest_path: bool | None,
+        profile: SolverProfile,
+        **details,
+    ):
+        """Store a profile; details (e.g. the probe scores) are kept alongside."""
+        key = profile_key(num_vehicles, num_customers, solve_for_shortest_path)
+        with self._lock:
+            self._reload()
+            self._profiles[key] = {"profile": asdict(profile), **details}
+            if self.path:
+                tmp_path = self.path.with_suffix(".tmp")
+                tmp_path.write_text(json.dumps(self._profiles, indent=2))
+                tmp_path.replace(self.path)
+                self._mtime = self.path.stat().st_mtime
+
+    def all(self) -> dict[str, dict]:
+        with self._lock:
+            self._reload()
+            return dict(self._profiles)
+
+    def _reload(self):
+        if not self.path:
+            return
+        try:
+            mtime = self.path.stat().st_mtime
+        except OSError:
+            return
+        if mtime != self._mtime:
+            try:
+                self._profiles = json.loads(self.path.read_text())
+            except (OSError, ValueError):
+                return
+            self._mtime = mtime
+
+
+profile_store = ProfileStore(
+    os.environ.get(
+        "SOLVER_PROFILES_PATH", Path(__file__).parent / "solver_profiles.json"
+    )
+)
+
+# Set SOLVER_AUTO_TUNE=0 to ignore the tuned profiles
+AUTO_TUNE = os.environ.get("SOLVER_AUTO_TUNE", "1") not in ("", "0", "false")
+
+
+def get_profile(
+    num_vehicles: int, num_customers: int, solve_for_shortest_path: bool | None
+) -> SolverProfile:
+    """The tuned profile of this size class, or the default one."""
+    if AUTO_TUNE:
+        profile = profile_store.get(
+            num_vehicles, num_customers, solve_for_shortest_path
+        )
+        if profile is not None:
+            return profile
+    return DEFAULT_PROFILE
@@ -0,0 +1,490 @@
+from abc import ABC, abstractmethod
+from pathlib import Path
+import hashlib
+import heapq
+import math
+import os
+import pickle
+import time
+import xml.etree.ElementTree as ElementTree
+
+import numpy as np
+
+EARTH_RADIUS_IN_M = 6371000
+# Meters per degree of the original straight-line estimate
+METERS_PER_DEGREE = 111000
+DEFAULT_SPEED_IN_M_PER_SEC = 4.5
+
+# OSM highway types a car can drive on
+DRIVABLE_HIGHWAYS = {
+    "motorway",
+    "trunk",
+    "primary",
+    "secondary",
+    "tertiary",
+    "unclassified",
+    "residential",
+    "living_street",
+    "service",
+    "motorway_link",
+    "trunk_link",
+    "primary_link",
+    "secondary_link",
+    "tertiary_link",
+}
+
+
+def haversine_in_m(points: np.ndarray, other_points: np.ndarray) -> np.ndarray:
+    """Great-circle distances between (lat, lon) points, broadcast elementwise."""
+    lat1, lon1 = np.moveaxis(np.radians(points), -1, 0)
+    lat2, lon2 = np.moveaxis(np.radians(other_points), -1, 0)
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_IN_M * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+class TravelTimeProvider(ABC):
+    """Node-to-node travel times for a list of (coordX, coordY) locations.
+
+    Every provider drives at speed_in_m_per_sec along its notion of distance,
+    so their matrices only differ in the distances.
+    """
+
+    name = "base"
+
+    def __init__(self, speed_in_m_per_sec: float = DEFAULT_SPEED_IN_M_PER_SEC):
+        self.speed_in_m_per_sec = speed_in_m_per_sec
+
+    @abstractmethod
+    def travel_times_in_sec(self, locations: np.ndarray) -> np.ndarray:
+        """(n, n) travel times in seconds between the (n, 2) locations."""
+
+    def warm(self):
+        """Load whatever the provider needs before the first solve."""
+
+    def time_matrix(self, locations) -> np.ndarray:
+        """Travel times in whole minutes, as used by the routing model."""
+        coords = np.asarray(locations, dtype=np.float64).reshape(-1, 2)
+        return np.rint(self.travel_times_in_sec(coords) / 60).astype(np.int64)
+
+    def time_matrices(self, locations, speeds: list[float]) -> np.ndarray:
+        """One minute matrix per speed, shape (len(speeds), n, n).
+
+        Travel times are computed once and scaled by the ratio of speeds.
+        """
+        coords = np.asarray(locations, dtype=np.float64).reshape(-1, 2)
+        times = self.travel_times_in_sec(coords)
+        factors = self.speed_in_m_per_sec / np.asarray(speeds, dtype=np.float64)
+        scaled = times[np.newaxis] * factors[:, np.newaxis, np.newaxis]
+        return np.rint(scaled / 60).astype(np.int64)
+
+
+class EuclideanProvider(TravelTimeProvider):
+    """Straight line in degrees times 111 km, the original estimate."""
+
+    name = "euclidean"
+
+    def travel_times_in_sec(self, locations: np.ndarray) -> np.ndarray:
+        deltas = locations[:, np.newaxis, :] - locations[np.newaxis, :, :]
+        distance_in_meters = (
+            np.hypot(deltas[..., 0], deltas[..., 1]) * METERS_PER_DEGREE
+        )
+        return distance_in_meters / self.speed_in_m_per_sec
+
+
+class HaversineProvider(TravelTimeProvider):
+    """Great-circle distance, so east-west distances shrink with the latitude."""
+
+    name = "haversine"
+
+    def travel_times_in_sec(self, locations: np.ndarray) -> np.ndarray:
+        distance_in_meters = haversine_in_m(
+            locations[:, np.newaxis], locations[np.newaxis]
+        )
+        return distance_in_meters / self.speed_in_m_per_sec
+
+
+class RoadGraph:
+    """Directed road graph: node (lat, lon) coordinates and edge lengths in m."""
+
+    def __init__(
+        self, node_coords: np.ndarray, edges: np.ndarray, edge_lengths: np.ndarray
+    ):
+        self.node_coords = np.asarray(node_coords, dtype=np.float64)
+        self.edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        self.edge_lengths = np.asarray(edge_lengths, dtype=np.float64)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "RoadGraph":
+        """Read a graph saved with save(), or parse an OSM XML extract."""
+        path = Path(path)
+        if path.suffix == ".osm":
+            return cls.from_osm(path)
+        with np.load(path) as data:
+            return cls(data["node_coords"], data["edges"], data["edge_lengths"])
+
+    def save(self, path: str | Path):
+        np.savez(
+            path,
+            node_coords=self.node_coords,
+            edges=self.edges,
+            edge_lengths=self.edge_lengths,
+        )
+
+    @classmethod
+    def from_osm(cls, path: str | Path) -> "RoadGraph":
+        """Build the drivable road graph of an OSM XML extract."""
+        osm_nodes = {}
+        ways = []
+        for _, element in ElementTree.iterparse(path):
+            if element.tag == "node":
+                osm_nodes[element.get("id")] = (
+                    float(element.get("lat")),
+                    float(element.get("lon")),
+                )
+            elif element.tag == "way":
+                tags = {tag.get("k"): tag.get("v") for tag in element.iter("tag")}
+                if tags.get("highway") in DRIVABLE_HIGHWAYS:
+                    node_ids = [node.get("ref") for node in element.iter("nd")]
+                    ways.append((node_ids, tags))
+            if element.tag in ("node", "way", "relation"):
+                element.clear()
+
+        node_index = {}
+        edges = []
+        for node_ids, tags in ways:
+            node_ids = [node_id for node_id in node_ids if node_id in osm_nodes]
+            for node_id in node_ids:
+                node_index.setdefault(node_id, len(node_index))
+            oneway = tags.get("oneway") in ("yes", "true", "1")
+            for start, end in zip(node_ids, node_ids[1:]):
+                edges.append((node_index[start], node_index[end]))
+                if not oneway:
+                    edges.append((node_index[end], node_index[start]))
+
+        node_coords = np.array(
+            [osm_nodes[node_id] for node_id in node_index], dtype=np.float64
+        ).reshape(-1, 2)
+        edges = np.array(edges, dtype=np.int64).reshape(-1, 2)
+        edge_lengths = haversine_in_m(
+            node_coords[edges[:, 0]], node_coords[edges[:, 1]]
+        )
+        return cls(node_coords, edges, edge_lengths)
+
+    def fingerprint(self) -> str:
+        digest = hashlib.sha256()
+        for array in (self.node_coords, self.edges, self.edge_lengths):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()[:16]
+
+    def adjacency(self) -> list[list[tuple[int, float]]]:
+        """Outgoing (node, length in m) per node."""
+        adjacency = [[] for _ in range(len(self.node_coords))]
+        for (start, end), length in zip(
+            self.edges.tolist(), self.edge_lengths.tolist()
+        ):
+            adjacency[start].append((end, length))
+        return adjacency
+
+    def _projection_scale(self) -> np.ndarray:
+        # Equirectangular projection is plenty within a city
+        return np.array([1, math.cos(math.radians(self.node_coords[:, 0].mean()))])
+
+    def nearest_nodes(
+        self,
+        points: np.ndarray,
+        candidates: np.ndarray | None = None,
+        chunk_size: int = 256,
+    ) -> np.ndarray:
+        """Closest node (among the candidate nodes) for every (lat, lon) point.
+
+        With candidates, positions into candidates are returned.
+        """
+        scale = self._projection_scale()
+        node_coords = (
+            self.node_coords if candidates is None else (self.node_coords[candidates])
+        )
+        nodes = node_coords * scale
+        nearest = np.empty(len(points), dtype=np.int64)
+        for start in range(0, len(points), chunk_size):
+            chunk = points[start : start + chunk_size] * scale
+            distances = ((chunk[:, np.newaxis] - nodes[np.newaxis]) ** 2).sum(-1)
+            nearest[start : start + chunk_size] = distances.argmin(axis=1)
+        return nearest
+
+    def anchor_nodes(self, spacing_in_m: float) -> np.ndarray:
+        """One node per grid cell of spacing_in_m, the one closest to its centre.
+
+        Road distances are only computed between anchors, so that a finite set
+        of them can be precomputed whatever locations the scenarios have.
+        """
+        cell_size = spacing_in_m / METERS_PER_DEGREE / self._projection_scale()
+        positions = self.node_coords / cell_size
+        cells = np.floor(positions)
+        offsets = ((positions - cells - 0.5) * self._projection_scale()) ** 2
+        cell_ids = np.unique(cells, axis=0, return_inverse=True)[1].ravel()
+        order = np.lexsort((offsets.sum(axis=1), cell_ids))
+        first_in_cell = np.r_[True, np.diff(cell_ids[order]) != 0]
+        return np.sort(order[first_in_cell])
+
+
+class TileCache:
+    """Road distances from anchor nodes to every anchor, persisted per tile.
+
+    Sources are grouped into square tiles of tile_size_in_deg, so a solve
+    only loads the tiles of the area it covers.
+    """
+
+    def __init__(
+        self,
+        node_coords: np.ndarray,
+        cache_dir: str | Path | None = None,
+        tile_size_in_deg: float = 0.01,
+    ):
+        self.node_coords = node_coords
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.tile_size_in_deg = tile_size_in_deg
+        self._tiles: dict[tuple[int, int], dict[int, np.ndarray]] = {}
+        self._dirty: set[tuple[int, int]] = set()
+
+    def tile_of(self, node: int) -> tuple[int, int]:
+        lat, lon = self.node_coords[node] // self.tile_size_in_deg
+        return int(lat), int(lon)
+
+    def get(self, source: int) -> np.ndarray | None:
+        return self._tile(self.tile_of(source)).get(source)
+
+    def put(self, source: int, distances: np.ndarray):
+        tile_key = self.tile_of(source)
+        self._tile(tile_key)[source] = distances.astype(np.float32)
+        self._dirty.add(tile_key)
+
+    def flush(self):
+        """Write the tiles changed since the last flush."""
+        if self.cache_dir:
+            for tile_key in self._dirty:
+                path = self._path(tile_key)
+                tmp_path = path.with_suffix(".tmp")
+                tmp_path.write_bytes(pickle.dumps(self._tiles[tile_key]))
+                tmp_path.replace(path)
+        self._dirty.clear()
+
+    def load_all(self):
+        """Read every tile on disk into memory."""
+        if self.cache_dir:
+            for path in self.cache_dir.glob("*.pkl"):
+                lat, lon = path.stem.split("_")
+                self._tile((int(lat), int(lon)))
+
+    def _tile(self, tile_key: tuple[int, int]) -> dict[int, np.ndarray]:
+        if tile_key not in self._tiles:
+            self._tiles[tile_key] = self._read_from_disk(tile_key)
+        return self._tiles[tile_key]
+
+    def _path(self, tile_key: tuple[int, int]) -> Path:
+        return self.cache_dir / f"{tile_key[0]}_{tile_key[1]}.pkl"
+
+    def _read_from_disk(self, tile_key: tuple[int, int]) -> dict:
+        if not self.cache_dir:
+            return {}
+        try:
+            return pickle.loads(self._path(tile_key).read_bytes())
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return {}
+
+
+class RoadGraphProvider(TravelTimeProvider):
+    """Driving times over a local road graph.
+
+    Locations are snapped to the nearest anchor node (see
+    RoadGraph.anchor_nodes) and the way to it is added as straight-line
+    travel. Road distances between anchors come from a TileCache, filled
+    ahead of time by precompute(). Distances a solve still has to compute
+    with Dijkstra are limited to budget_in_sec; pairs beyond it are estimated
+    as straight-line travel.
+    """
+
+    def __init__(
+        self,
+        graph_path: str | Path,
+        cache_dir: str | Path | None = None,
+        speed_in_m_per_sec: float = DEFAULT_SPEED_IN_M_PER_SEC,
+        anchor_spacing_in_m: float = 250,
+        budget_in_sec: float = 1,
+    ):
+        super().__init__(speed_in_m_per_sec)
+        self.graph_path = Path(graph_path)
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.anchor_spacing_in_m = anchor_spacing_in_m
+        self.budget_in_sec = budget_in_sec
+        self.name = f"road:{self.graph_path.name}"
+        self._graph = None
+        self._adjacency = None
+        self._anchors = None
+        self._anchor_position = None
+        self._cache = None
+
+    @property
+    def graph(self) -> RoadGraph:
+        if self._graph is None:
+            self._graph = RoadGraph.load(self.graph_path)
+            self._adjacency = self._graph.adjacency()
+            self._anchors = self._graph.anchor_nodes(self.anchor_spacing_in_m)
+            self._anchor_position = np.full(len(self._graph.node_coords), -1)
+            self._anchor_position[self._anchors] = np.arange(len(self._anchors))
+            cache_dir = None
+            if self.cache_dir:
+                # Distances are only valid for this graph and these anchors
+                cache_dir = (
+                    self.cache_dir
+                    / f"{self._graph.fingerprint()}-{self.anchor_spacing_in_m}"
+                )
+            self._cache = TileCache(self._graph.node_coords, cache_dir)
+        return self._graph
+
+    def warm(self):
+        self.graph
+        self._cache.load_all()
+
+    def travel_times_in_sec(self, locations: np.ndarray) -> np.ndarray:
+        graph = self.graph
+        positions = graph.nearest_nodes(locations, self._anchors)
+        nodes = self._anchors[positions]
+        access_in_m = haversine_in_m(locations, graph.node_coords[nodes])
+
+        unique_positions, rows = np.unique(positions, return_inverse=True)
+        road_in_m = self._road_distances(unique_positions)[np.ix_(rows, rows)]
+        distances = access_in_m[:, np.newaxis] + road_in_m + access_in_m[np.newaxis]
+
+        # Unreachable or not computed pairs and locations snapped to the same
+        # anchor are treated as straight-line travel
+        direct_in_m = haversine_in_m(locations[:, np.newaxis], locations[np.newaxis])
+        same_anchor = positions[:, np.newaxis] == positions[np.newaxis, :]
+        distances = np.where(
+            same_anchor | ~np.isfinite(distances), direct_in_m, distances
+        )
+        np.fill_diagonal(distances, 0)
+        return distances / self.speed_in_m_per_sec
+
+    def precompute(self, flush_every: int = 100):
+        """Fill the cache with the distances between all anchors."""
+        self.warm()
+        missing = [
+            node for node in self._anchors.tolist() if self._cache.get(node) is None
+        ]
+        start_time = time.perf_counter()
+        for done, node in enumerate(missing, 1):
+            self._cache.put(node, self._dijkstra(node))
+            if done % flush_every == 0 or done == len(missing):
+                self._cache.flush()
+                print(
+                    f"{done}/{len(missing)} anchors "
+                    f"({time.perf_counter() - start_time:.0f}s)"
+                )
+
+    def _road_distances(self, positions: np.ndarray) -> np.ndarray:
+        """Road distances in m between the anchors at positions, NaN if unknown."""
+        deadline = time.perf_counter() + self.budget_in_sec
+        distances = np.full((len(positions), len(positions)), np.nan)
+        estimated = 0
+        for i, node in enumerate(self._anchors[positions].tolist()):
+            row = self._cache.get(node)
+            if row is None and time.perf_counter() < deadline:
+                row = self._dijkstra(node)
+                self._cache.put(node, row)
+            if row is None:
+                estimated += 1
+            else:
+                distances[i] = row[positions]
+        self._cache.flush()
+        if estimated:
+            print(
+                f"Estimated the road distances from {estimated} of "
+                f"{len(positions)} anchors, precompute the road graph cache."
+            )
+        return distances
+
+    def _dijkstra(self, source: int) -> np.ndarray:
+        """Road distances from source to every anchor, inf if unreachable."""
+        distances = np.full(len(self._anchors), np.inf)
+        remaining = len(self._anchors)
+        best = {source: 0.0}
+        settled = set()
+        heap = [(0.0, source)]
+        while heap and remaining:
+            distance, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            settled.add(node)
+            position = self._anchor_position[node]
+            if position >= 0:
+                distances[position] = distance
+                remaining -= 1
+            for neighbour, length in self._adjacency[node]:
+                new_distance = distance + length
+                if new_distance < best.get(neighbour, math.inf):
+                    best[neighbour] = new_distance
+                    heapq.heappush(heap, (new_distance, neighbour))
+        return distances
+
+
+def provider_from_env() -> TravelTimeProvider:
+    """Provider chosen by TRAVEL_TIME_PROVIDER (euclidean, haversine or road)."""
+    name = os.environ.get("TRAVEL_TIME_PROVIDER", "euclidean")
+    if name == "euclidean":
+        return EuclideanProvider()
+    if name == "haversine":
+        return HaversineProvider()
+    if name == "road":
+        graph_path = os.environ.get("ROAD_GRAPH_PATH")
+        if not graph_path:
+            raise ValueError("TRAVEL_TIME_PROVIDER=road needs ROAD_GRAPH_PATH.")
+        return RoadGraphProvider(
+            graph_path,
+            os.environ.get("TRAVEL_TIME_CACHE_DIR"),
+            anchor_spacing_in_m=float(os.environ.get("ROAD_GRAPH_ANCHOR_SPACING", 250)),
+            budget_in_sec=float(os.environ.get("ROAD_GRAPH_BUDGET", 1)),
+        )
+    raise ValueError(f"Unknown travel time provider {name!r}.")
+
+
+_travel_time_provider: TravelTimeProvider | None = None
+
+
+def get_travel_time_provider() -> TravelTimeProvider:
+    """Returns the provider of this process, created on first use."""
+    global _travel_time_provider
+    if _travel_time_provider is None:
+        _travel_time_provider = provider_from_env()
+    return _travel_time_provider
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Prepare a road graph.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    # Convert an OSM XML extract once, loading the .npz is much faster
+    convert = commands.add_parser("convert", help="OSM XML extract to .npz")
+    convert.add_argument("osm_path")
+    convert.add_argument("output_path")
+    precompute = commands.add_parser(
+        "precompute", help="fill the cache of road distances between anchors"
+    )
+    precompute.add_argument("graph_path")
+    precompute.add_argument("cache_dir")
+    precompute.add_argument("--anchor-spacing", type=float, default=250)
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        road_graph = RoadGraph.from_osm(args.osm_path)
+        road_graph.save(args.output_path)
+        print(f"{len(road_graph.node_coords)} nodes, {len(road_graph.edges)} edges")
+    else:
+        RoadGraphProvider(
+            args.graph_path, args.cache_dir, anchor_spacing_in_m=args.anchor_spacing
+        ).precompute()
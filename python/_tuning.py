@@ -0,0 +1,227 @@
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import asyncio
+import itertools
+import multiprocessing
+import os
+
+from scenario_model import Scenario
+from _scenario_columns import ScenarioColumns, as_columns
+from _create_route import get_routing_solution
+from _metrics import call_with_metrics, unwrap_metrics
+from _solver_pool import solver_pool
+from _solver_profile import DEFAULT_PROFILE, SolverProfile, profile_store
+from synthetic_scenario import make_scenario
+
+# Below 2 times the fair share the fleet cannot hold every customer anyway
+CAPACITY_FACTORS = (2.5, 3.0, 4.0, 8.0)
+SPAN_COST_COEFFICIENTS = (10, 20, 50)
+WAITING_TIME_COEFFICIENTS = (0, 100)
+
+
+def candidate_profiles(solve_for_shortest_path: bool | None) -> list[SolverProfile]:
+    """The default profile first, then a grid over the objective's weights."""
+    candidates = [DEFAULT_PROFILE]
+    for (
+        capacity_factor,
+        span_cost_coefficient,
+        waiting_time_coefficient,
+    ) in itertools.product(
+        CAPACITY_FACTORS, SPAN_COST_COEFFICIENTS, WAITING_TIME_COEFFICIENTS
+    ):
+        if solve_for_shortest_path:
+            profile = SolverProfile(
+                capacity_factor=capacity_factor,
+                total_time_span_coefficient=span_cost_coefficient,
+                waiting_time_coefficient=waiting_time_coefficient,
+            )
+        else:
+            profile = SolverProfile(
+                capacity_factor=capacity_factor,
+                makespan_span_coefficient=span_cost_coefficient,
+                waiting_time_coefficient=waiting_time_coefficient,
+            )
+        if profile != DEFAULT_PROFILE:
+            candidates.append(profile)
+    return candidates
+
+
+def probe(
+    profile: SolverProfile,
+    scenario: Scenario | ScenarioColumns,
+    solve_for_shortest_path: bool | None,
+    probe_time_in_sec: float,
+) -> tuple[int, int]:
+    """(makespan, total travel time) of a short solve with the profile."""
+    _, total_time, max_travel_time, _ = get_routing_solution(
+        scenario,
+        None,
+        solve_for_shortest_path,
+        probe_time_in_sec,
+        profile=profile,
+    )
+    return max_travel_time, total_time
+
+
+def pick_profile(
+    candidates: list[SolverProfile],
+    results: list,
+    num_scenarios: int,
+    solve_for_shortest_path: bool | None,
+) -> tuple[SolverProfile, dict[str, int]]:
+    """Best candidate over all probe scenarios by the requested objective.
+
+    Every probe gets the same time limit, so the best result is also the best
+    result per solve second. Ties go to the earlier candidate, i.e. the default.
+    """
+    scores = {}
+    for index, profile in enumerate(candidates):
+        probes = results[index * num_scenarios : (index + 1) * num_scenarios]
+        if any(isinstance(result, BaseException) for result in probes):
+            continue
+        scores[profile] = {
+            "makespan": sum(result[0] for result in probes),
+            "total_time": sum(result[1] for result in probes),
+        }
+    if not scores:
+        raise ValueError("Every probe solve failed.")
+
+    def objective(profile):
+        score = scores[profile]
+        if solve_for_shortest_path:
+            return (score["total_time"], score["makespan"])
+        return (score["makespan"], score["total_time"])
+
+    best_profile = min(scores, key=objective)
+    print(
+        f"Tuned {best_profile}: {scores[best_profile]} "
+        f"(default: {scores.get(DEFAULT_PROFILE, 'failed')})"
+    )
+    return best_profile, scores[best_profile]
+
+
+def store_profile(
+    scenarios: list[ScenarioColumns],
+    solve_for_shortest_path: bool | None,
+    profile: SolverProfile,
+    probe_time_in_sec: float,
+    score: dict[str, int],
+):
+    # The size class of the first scenario; callers tune one class at a time
+    profile_store.put(
+        scenarios[0].num_vehicles,
+        scenarios[0].num_customers,
+        solve_for_shortest_path,
+        profile,
+        probe_time_in_sec=probe_time_in_sec,
+        scenarios=[scenario.id for scenario in scenarios],
+        **score,
+    )
+
+
+def tune_profile(
+    scenarios: list[Scenario | ScenarioColumns],
+    solve_for_shortest_path: bool | None = False,
+    probe_time_in_sec: float = 1,
+    max_workers: int | None = None,
+) -> SolverProfile:
+    """Probe every candidate profile on the scenarios and store the best one."""
+    scenarios = [as_columns(scenario) for scenario in scenarios]
+    candidates = candidate_profiles(solve_for_shortest_path)
+    with ProcessPoolExecutor(
+        max_workers=max_workers or os.cpu_count(),
+        mp_context=multiprocessing.get_context("spawn"),
+    ) as executor:
+        futures = [
+            executor.submit(
+                call_with_metrics,
+                probe,
+                profile,
+                scenario,
+                solve_for_shortest_path,
+                probe_time_in_sec,
+            )
+            for profile in candidates
+            for scenario in scenarios
+        ]
+        results = [
+            future.exception() or unwrap_metrics(future.result()) for future in futures
+        ]
+    profile, score = pick_profile(
+        candidates, results, len(scenarios), solve_for_shortest_path
+    )
+    store_profile(scenarios, solve_for_shortest_path, profile, probe_time_in_sec, score)
+    return profile
+
+
+async def tune_profile_async(
+    scenarios: list[Scenario | ScenarioColumns],
+    solve_for_shortest_path: bool | None = False,
+    probe_time_in_sec: float = 1,
+) -> SolverProfile:
+    """Like tune_profile, but on the shared solver pool.
+
+    At most one probe per worker is in flight, so tuning does not fill the
+    pool's queue and regular solves are still admitted.
+    """
+    scenarios = [as_columns(scenario) for scenario in scenarios]
+    candidates = candidate_profiles(solve_for_shortest_path)
+    semaphore = asyncio.Semaphore(solver_pool.max_workers)
+
+    async def bounded_probe(profile, scenario):
+        async with semaphore:
+            return await solver_pool.submit(
+                probe, profile, scenario, solve_for_shortest_path, probe_time_in_sec
+            )
+
+    results = await asyncio.gather(
+        *(
+            bounded_probe(profile, scenario)
+            for profile in candidates
+            for scenario in scenarios
+        ),
+        return_exceptions=True,
+    )
+    profile, score = pick_profile(
+        candidates, results, len(scenarios), solve_for_shortest_path
+    )
+    store_profile(scenarios, solve_for_shortest_path, profile, probe_time_in_sec, score)
+    return profile
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Tune solver profiles on synthetic scenarios."
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        default=["5x20", "10x100", "20x200"],
+        help="vehicles x customers, e.g. 10x100; one profile per size",
+    )
+    parser.add_argument(
+        "--layouts",
+        nargs="+",
+        default=["uniform", "clustered"],
+        choices=["uniform", "clustered"],
+    )
+    parser.add_argument(
+        "--objectives",
+        nargs="+",
+        default=["makespan"],
+        choices=["makespan", "shortest"],
+    )
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0])
+    parser.add_argument("--probe-time", type=float, default=1)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        vehicles, customers = (int(n) for n in size.split("x"))
+        scenarios = [
+            make_scenario(vehicles, customers, layout, seed)
+            for layout in args.layouts
+            for seed in args.seeds
+        ]
+        for objective in args.objectives:
+            print(f"Tuning {size} {objective}")
+            tune_profile(scenarios, objective == "shortest", args.probe_time)
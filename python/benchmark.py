@@ -0,0 +1,409 @@
+from dataclasses import asdict
+from pathlib import Path
+import argparse
+import asyncio
+import csv
+import functools
+import itertools
+import json
+import multiprocessing
+import resource
+import subprocess
+import sys
+import time
+
+from ortools.constraint_solver import pywrapcp
+from ortools.constraint_solver import routing_enums_pb2
+
+from scenario_model import Scenario
+from _create_route import (
+    build_locations,
+    get_greedy_solution,
+    get_routing_solution,
+    get_vehicle_capacity,
+)
+from _scenario_columns import ScenarioColumns, as_columns
+from _solver_profile import DEFAULT_PROFILE, get_profile
+from synthetic_scenario import make_scenario
+from _solver_pool import SolverPool
+from _penalties import (
+    add_max_overall_capacity_per_vehicle,
+    add_pickup_delivery_constraints,
+    create_time_dimension,
+    create_time_matrix,
+    minimize_largest_end_time,
+    set_penalty_for_waiting_at_start,
+)
+
+
+def _add_callback_capacity(routing, vehicle_capacities: list[int]):
+    """Capacity dimension as it was built with a Python demand callback."""
+
+    def demand_callback(index):
+        return 1
+
+    demand_callback_index = routing.RegisterUnaryTransitCallback(demand_callback)
+    routing.AddDimensionWithVehicleCapacity(
+        demand_callback_index, 0, vehicle_capacities, True, "Capacity"
+    )
+
+
+def _add_callback_waiting_time(routing):
+    """WaitingTime dimension as it was built with a Python transit callback."""
+
+    def waiting_time_callback(from_index, _):
+        return 0 if routing.IsEnd(from_index) else 1
+
+    waiting_time_index = routing.RegisterTransitCallback(waiting_time_callback)
+    routing.AddDimension(waiting_time_index, 0, 10000, True, "WaitingTime")
+    routing.GetDimensionOrDie("WaitingTime").SetGlobalSpanCostCoefficient(100)
+
+
+def benchmark_dimensions(
+    scenario: Scenario | ScenarioColumns,
+    use_callbacks: bool,
+    max_solv_time_in_sec: int = 5,
+) -> dict:
+    """Solves the scenario once and reports the search throughput."""
+    scenario = as_columns(scenario)
+    locations, _, starts, ends = build_locations(scenario, None)
+    num_cars = scenario.num_vehicles
+
+    manager = pywrapcp.RoutingIndexManager(len(locations), num_cars, starts, ends)
+    routing = pywrapcp.RoutingModel(manager)
+    time_callback_indices = create_time_dimension(
+        routing, manager, create_time_matrix(locations)
+    )
+    add_pickup_delivery_constraints(
+        routing,
+        [(2 * i, 2 * i + 1) for i in range(scenario.num_customers)],
+    )
+    capacities = [get_vehicle_capacity(scenario)] * num_cars
+    if use_callbacks:
+        _add_callback_capacity(routing, capacities)
+    else:
+        add_max_overall_capacity_per_vehicle(routing, manager, capacities)
+    minimize_largest_end_time(routing, time_callback_indices)
+    if use_callbacks:
+        _add_callback_waiting_time(routing)
+    else:
+        set_penalty_for_waiting_at_start(routing)
+
+    search_parameters = pywrapcp.DefaultRoutingSearchParameters()
+    search_parameters.first_solution_strategy = (
+        routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
+    )
+    search_parameters.local_search_metaheuristic = (
+        routing_enums_pb2.LocalSearchMetaheuristic.AUTOMATIC
+    )
+    search_parameters.time_limit.seconds = max_solv_time_in_sec
+
+    start_time = time.perf_counter()
+    solution = routing.SolveWithParameters(search_parameters)
+    elapsed_time = time.perf_counter() - start_time
+    solver = routing.solver()
+    return {
+        "use_callbacks": use_callbacks,
+        "objective": solution.ObjectiveValue() if solution else None,
+        "branches": solver.Branches(),
+        "solutions": solver.Solutions(),
+        "elapsed_time_in_sec": elapsed_time,
+        "branches_per_sec": solver.Branches() / elapsed_time,
+    }
+
+
+GREEDY = "GREEDY"
+# Solver profile of the cases: the hand-picked default, so that results are
+# comparable across machines, or whatever was tuned on this machine
+DEFAULT = "default"
+TUNED = "tuned"
+
+
+def load_case_scenario(case: dict, snapshot_dir: Path | None = None):
+    """Generate the case's scenario, or memory-map it from a snapshot directory."""
+    if snapshot_dir is None:
+        return make_scenario(
+            case["vehicles"], case["customers"], case["layout"], case["seed"]
+        )
+    name = f"{case['layout']}-{case['vehicles']}x{case['customers']}-{case['seed']}"
+    path = snapshot_dir / name
+    if not (path / "meta.json").exists():
+        make_scenario(
+            case["vehicles"], case["customers"], case["layout"], case["seed"]
+        ).save(path)
+    return ScenarioColumns.load(path)
+
+
+def run_case(case: dict, snapshot_dir: Path | None = None) -> dict:
+    """Solve one benchmark case and measure it.
+
+    Meant to run in a fresh process, so that the peak memory (which includes
+    the imported libraries) belongs to this case only.
+    """
+    scenario = load_case_scenario(case, snapshot_dir)
+    solve_for_shortest_path = case["objective"] == "shortest"
+    # The greedy plan always builds on the default profile
+    profile = DEFAULT_PROFILE
+    if case["profile"] == TUNED and case["strategy"] != GREEDY:
+        profile = get_profile(
+            scenario.num_vehicles, scenario.num_customers, solve_for_shortest_path
+        )
+    start_time = time.perf_counter()
+    if case["strategy"] == GREEDY:
+        _, total_time, max_travel_time, _ = get_greedy_solution(
+            scenario, None, solve_for_shortest_path
+        )
+    else:
+        first_solution_strategy, local_search_metaheuristic = case["strategy"].split(
+            "/"
+        )
+        _, total_time, max_travel_time, _ = get_routing_solution(
+            scenario,
+            None,
+            solve_for_shortest_path,
+            case["time_limit_in_sec"],
+            first_solution_strategy=first_solution_strategy,
+            local_search_metaheuristic=local_search_metaheuristic,
+            profile=profile,
+        )
+    solve_latency = time.perf_counter() - start_time
+    return {
+        **case,
+        "makespan": max_travel_time,
+        "total_time": total_time,
+        "solve_latency_in_sec": solve_latency,
+        **{f"profile_{name}": value for name, value in asdict(profile).items()},
+        # ru_maxrss is in kilobytes on Linux
+        "peak_memory_in_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def benchmark_cases(
+    sizes: list[tuple[int, int]],
+    layouts: list[str],
+    objectives: list[str],
+    time_limits: list[float],
+    strategies: list[str],
+    seeds: list[int],
+    profile: str = DEFAULT,
+) -> list[dict]:
+    cases = {}
+    for (
+        (vehicles, customers),
+        layout,
+        objective,
+        time_limit,
+        strategy,
+        seed,
+    ) in itertools.product(sizes, layouts, objectives, time_limits, strategies, seeds):
+        if strategy == GREEDY:
+            # The heuristic has no time limit
+            time_limit = 0
+        case = {
+            "vehicles": vehicles,
+            "customers": customers,
+            "layout": layout,
+            "objective": objective,
+            "time_limit_in_sec": time_limit,
+            "strategy": strategy,
+            "seed": seed,
+            "profile": profile,
+        }
+        cases[tuple(case.values())] = case
+    return list(cases.values())
+
+
+def run_benchmarks(cases: list[dict], snapshot_dir: Path | None = None) -> list[dict]:
+    results = []
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes=1, maxtasksperchild=1) as pool:
+        for result in pool.imap(
+            functools.partial(run_case, snapshot_dir=snapshot_dir), cases
+        ):
+            print(
+                f"{result['vehicles']}x{result['customers']} {result['layout']} "
+                f"{result['objective']} {result['strategy']} "
+                f"{result['time_limit_in_sec']}s seed {result['seed']}: "
+                f"makespan {result['makespan']}, total {result['total_time']}, "
+                f"{result['solve_latency_in_sec']:.2f}s, "
+                f"{result['peak_memory_in_mb']:.0f} MB"
+            )
+            results.append(result)
+    return results
+
+
+def write_results(results: list[dict], output: Path):
+    """Write the results to <output>.json and <output>.csv."""
+    output.with_suffix(".json").write_text(json.dumps(results, indent=2))
+    with output.with_suffix(".csv").open("w", newline="") as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=list(results[0]))
+        writer.writeheader()
+        writer.writerows(results)
+
+
+# Run in a fresh interpreter, so that nothing is imported yet
+COLD_START_SCRIPT = """
+import json, sys, time
+start_time = time.perf_counter()
+from _create_route import get_routing_solution
+from synthetic_scenario import make_scenario
+import_time = time.perf_counter() - start_time
+vehicles, customers, time_limit = int(sys.argv[1]), int(sys.argv[2]), float(sys.argv[3])
+solve_times = []
+for _ in range(2):
+    start_time = time.perf_counter()
+    get_routing_solution(make_scenario(vehicles, customers), None, False, time_limit)
+    solve_times.append(time.perf_counter() - start_time)
+print(json.dumps([import_time, *solve_times]))
+"""
+
+
+async def _measure_pool_start(
+    vehicles: int, customers: int, time_limit: float, prefork: bool
+) -> tuple[float, float]:
+    """(warm-up time, latency of the first request) of a new solver pool."""
+    pool = SolverPool(max_workers=1, max_queued=0)
+    try:
+        start_time = time.perf_counter()
+        if prefork:
+            await pool.start()
+        warm_up_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        await pool.submit(
+            get_routing_solution,
+            make_scenario(vehicles, customers),
+            None,
+            False,
+            time_limit,
+        )
+        return warm_up_time, time.perf_counter() - start_time
+    finally:
+        pool.shutdown()
+
+
+def measure_cold_start(
+    vehicles: int = 5, customers: int = 20, time_limit: float = 1
+) -> dict:
+    """Startup costs of a new process and of a new solver pool.
+
+    The first request to a pool that was not started pays for spawning and
+    warming up its worker; a started pool pays that before it is ready.
+    """
+    output = subprocess.run(
+        [sys.executable, "-c", COLD_START_SCRIPT]
+        + [str(vehicles), str(customers), str(time_limit)],
+        cwd=Path(__file__).parent,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    import_time, first_solve_time, second_solve_time = json.loads(
+        output.splitlines()[-1]
+    )
+    _, cold_pool_request_time = asyncio.run(
+        _measure_pool_start(vehicles, customers, time_limit, prefork=False)
+    )
+    warm_up_time, warm_pool_request_time = asyncio.run(
+        _measure_pool_start(vehicles, customers, time_limit, prefork=True)
+    )
+    return {
+        "vehicles": vehicles,
+        "customers": customers,
+        "time_limit_in_sec": time_limit,
+        "import_in_sec": import_time,
+        "first_solve_in_sec": first_solve_time,
+        "second_solve_in_sec": second_solve_time,
+        "pool_warm_up_in_sec": warm_up_time,
+        "cold_pool_first_request_in_sec": cold_pool_request_time,
+        "warm_pool_first_request_in_sec": warm_pool_request_time,
+    }
+
+
+def print_dimension_comparison():
+    scenario = Scenario.parse_file((Path(__file__).parent / "example.json"))
+    for use_callbacks in (True, False):
+        result = benchmark_dimensions(scenario, use_callbacks)
+        label = "python callbacks" if use_callbacks else "native dimensions"
+        print(
+            f"{label:>18}: {result['branches_per_sec']:.0f} branches/s, "
+            f"{result['solutions']} solutions, objective {result['objective']}"
+        )
+    _, total_time, max_travel_time, elapsed_time = get_greedy_solution(scenario, None)
+    print(
+        f"{'greedy baseline':>18}: {elapsed_time * 1000:.1f} ms, "
+        f"total {total_time}, last arrival {max_travel_time}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline solver benchmarks.")
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        default=["5x20", "10x100", "20x200"],
+        help="vehicles x customers, e.g. 10x100",
+    )
+    parser.add_argument(
+        "--layouts",
+        nargs="+",
+        default=["uniform", "clustered"],
+        choices=["uniform", "clustered"],
+    )
+    parser.add_argument(
+        "--objectives",
+        nargs="+",
+        default=["makespan"],
+        choices=["makespan", "shortest"],
+    )
+    parser.add_argument("--time-limits", nargs="+", type=float, default=[1, 5])
+    parser.add_argument(
+        "--strategies",
+        nargs="+",
+        default=["PATH_CHEAPEST_ARC/AUTOMATIC", GREEDY],
+        help="FIRST_SOLUTION_STRATEGY/LOCAL_SEARCH_METAHEURISTIC or GREEDY",
+    )
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0])
+    parser.add_argument(
+        "--profile",
+        default=DEFAULT,
+        choices=[DEFAULT, TUNED],
+        help="solver profile: the default one, or the one tuned on this machine",
+    )
+    parser.add_argument("--output", type=Path, default=Path("benchmark_results"))
+    parser.add_argument(
+        "--snapshot-dir",
+        type=Path,
+        help="keep the generated scenarios as memory-mapped snapshots here",
+    )
+    parser.add_argument(
+        "--dimensions",
+        action="store_true",
+        help="only compare callback and native dimensions on example.json",
+    )
+    parser.add_argument(
+        "--cold-start",
+        action="store_true",
+        help="only measure process and solver pool startup with the first size",
+    )
+    args = parser.parse_args()
+
+    if args.dimensions:
+        print_dimension_comparison()
+    elif args.cold_start:
+        vehicles, customers = (int(n) for n in args.sizes[0].split("x"))
+        result = measure_cold_start(vehicles, customers, args.time_limits[0])
+        print(json.dumps(result, indent=2))
+        args.output.with_suffix(".cold_start.json").write_text(
+            json.dumps(result, indent=2)
+        )
+    else:
+        cases = benchmark_cases(
+            [tuple(int(n) for n in size.split("x")) for size in args.sizes],
+            args.layouts,
+            args.objectives,
+            args.time_limits,
+            args.strategies,
+            args.seeds,
+            args.profile,
+        )
+        write_results(run_benchmarks(cases, args.snapshot_dir), args.output)
@@ -0,0 +1,11 @@
+import pytest
+
+from _solver_pool import SolverPool
+
+
+@pytest.fixture(scope="session")
+def solver_pool():
+    # Holds two calls: one running and one queued
+    solver_pool = SolverPool(max_workers=1, max_queued=1)
+    yield solver_pool
+    solver_pool.shutdown()
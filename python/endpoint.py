@@ -1,8 +1,23 @@
+from dataclasses import asdict
+import asyncio
 from fastapi import FastAPI, HTTPException, BackgroundTasks
-from fastapi.responses import RedirectResponse
+from fastapi.responses import PlainTextResponse, RedirectResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List
-from main import run_main, run_solver
+from main import (
+    REPLAN_INTERVAL_IN_SEC,
+    close_http_client,
+    fetch_scenario,
+    run_batch_solver_async,
+    run_main,
+    run_solver_async,
+)
+from _jobs import job_store
+from _metrics import metrics
+from _solution_cache import solution_cache
+from _solver_pool import SolverBusyError, solver_pool
+from _solver_profile import profile_store
+from _tuning import tune_profile_async
 from typing import Optional
 
 app = FastAPI(
@@ -21,6 +36,11 @@ class RouteRequest(BaseModel):
     solve_for_shortest_path: Optional[bool] = False
     start_cars: Optional[bool] = True
     go_to_hub: Optional[bool] = False
+    max_solv_time_in_sec: Optional[float] = 5
+    allow_degraded: Optional[bool] = False
+    portfolio: Optional[bool] = False
+    # Rolling horizon: replan the unserved customers every this many seconds
+    replan_interval_in_sec: Optional[float] = REPLAN_INTERVAL_IN_SEC
 
 
 class RouteResponse(BaseModel):
@@ -29,13 +49,49 @@ class RouteResponse(BaseModel):
     last_customer_at_destination_in_sec: int
 
 
+# Keeps the solver pool warm-up alive while the server starts accepting requests
+startup_tasks = set()
+
+
+@app.on_event("startup")
+async def startup():
+    task = asyncio.create_task(solver_pool.start())
+    startup_tasks.add(task)
+    task.add_done_callback(startup_tasks.discard)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await close_http_client()
+    solver_pool.shutdown()
+    job_store.shutdown()
+
+
 @app.get("/")
 def redirect_to_docs():
     return RedirectResponse(url="/docs")
 
 
+@app.get("/health")
+def health() -> dict:
+    """Liveness: the server answers requests."""
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+def ready() -> dict:
+    """Readiness: every solver worker is spawned and warmed up."""
+    if not solver_pool.ready:
+        raise HTTPException(
+            status_code=503,
+            detail=f"{solver_pool.warm_workers} of {solver_pool.max_workers} "
+            "solver workers are warm.",
+        )
+    return {"status": "ready", "workers": solver_pool.warm_workers}
+
+
 @app.post("/solve-routing", response_model=RouteResponse)
-def solve_routing(
+async def solve_routing(
     request: RouteRequest, background_tasks: BackgroundTasks
 ) -> RouteResponse:
     """
@@ -46,15 +102,26 @@ def solve_routing(
         hub_coords = (48.137371, 11.575328)
     try:
         (car_routes, total_travel_time, max_car_travel_time, elapsed_time_algo) = (
-            run_solver(
+            await run_solver_async(
                 request.scenario_id,
                 hub_coords,
                 request.solve_for_shortest_path,
-                5,
+                request.max_solv_time_in_sec,
+                allow_degraded=request.allow_degraded,
+                portfolio=request.portfolio,
             )
         )
         if request.start_cars:
-            background_tasks.add_task(run_main, request.scenario_id, car_routes)
+            background_tasks.add_task(
+                run_main,
+                request.scenario_id,
+                car_routes,
+                hub_coords,
+                request.solve_for_shortest_path,
+                replan_interval=request.replan_interval_in_sec,
+            )
+    except SolverBusyError as exc:
+        raise HTTPException(status_code=429, detail=str(exc))
     except Exception as exc:
         print(str(exc))
         raise HTTPException(status_code=400, detail=str(exc))
@@ -71,14 +138,21 @@ class SolverRequest(BaseModel):
 
 
 @app.post("/solver", response_model=RouteResponse)
-def solver(request: SolverRequest) -> RouteResponse:
+async def solver(request: SolverRequest) -> RouteResponse:
     """
     Solves a simple routing problem (e.g., finding the order to visit locations).
     """
     try:
-        (_, total_travel_time, max_car_travel_time, elapsed_time_algo) = run_solver(
+        (
+            _,
+            total_travel_time,
+            max_car_travel_time,
+            elapsed_time_algo,
+        ) = await run_solver_async(
             request.scenario_id, None, False, request.max_solv_time_in_sec
         )
+    except SolverBusyError as exc:
+        raise HTTPException(status_code=429, detail=str(exc))
     except Exception as exc:
         print(str(exc))
         raise HTTPException(status_code=400, detail=str(exc))
@@ -87,3 +161,179 @@ def solver(request: SolverRequest) -> RouteResponse:
         overall_car_usage_in_sec=total_travel_time,
         last_customer_at_destination_in_sec=max_car_travel_time,
     )
+
+
+class BatchSolverRequest(BaseModel):
+    scenario_ids: List[str]
+    solve_for_shortest_path: Optional[bool] = False
+    go_to_hub: Optional[bool] = False
+    # Time limit of every single solve, not of the whole batch
+    max_solv_time_in_sec: float = 10
+
+
+class BatchRouteResponse(BaseModel):
+    scenario_id: str
+    result: Optional[RouteResponse] = None
+    error: Optional[str] = None
+
+
+@app.post("/solver/batch")
+async def solver_batch(request: BatchSolverRequest) -> StreamingResponse:
+    """
+    Solves many scenarios in parallel and streams one JSON line per scenario
+    (a BatchRouteResponse) as soon as it is solved.
+    """
+    hub_coords = None
+    if request.go_to_hub:
+        hub_coords = (48.137371, 11.575328)
+
+    async def results():
+        async for scenario_id, result in run_batch_solver_async(
+            request.scenario_ids,
+            hub_coords,
+            request.solve_for_shortest_path,
+            request.max_solv_time_in_sec,
+        ):
+            if isinstance(result, Exception):
+                print(str(result))
+                response = BatchRouteResponse(
+                    scenario_id=scenario_id, error=str(result)
+                )
+            else:
+                _, total_travel_time, max_car_travel_time, elapsed_time_algo = result
+                response = BatchRouteResponse(
+                    scenario_id=scenario_id,
+                    result=RouteResponse(
+                        time_algo_took_in_sec=elapsed_time_algo,
+                        overall_car_usage_in_sec=total_travel_time,
+                        last_customer_at_destination_in_sec=max_car_travel_time,
+                    ),
+                )
+            yield response.json() + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+class JobResponse(BaseModel):
+    job_id: str
+
+
+# Keeps dispatchers started by finished jobs alive until they are done
+dispatch_tasks = set()
+
+
+@app.post("/jobs", response_model=JobResponse)
+async def submit_job(request: RouteRequest) -> JobResponse:
+    """
+    Starts solving in the background and returns a job id to poll or stream.
+    """
+    if solver_pool.is_saturated():
+        raise HTTPException(status_code=429, detail="All solver workers are busy.")
+    hub_coords = None
+    if request.go_to_hub:
+        hub_coords = (48.137371, 11.575328)
+    try:
+        scenario = await fetch_scenario(request.scenario_id)
+    except Exception as exc:
+        print(str(exc))
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    def start_cars(result):
+        task = asyncio.create_task(
+            run_main(
+                request.scenario_id,
+                result[0],
+                hub_coords,
+                request.solve_for_shortest_path,
+                replan_interval=request.replan_interval_in_sec,
+            )
+        )
+        dispatch_tasks.add(task)
+        task.add_done_callback(dispatch_tasks.discard)
+
+    job = job_store.submit(
+        scenario,
+        hub_coords,
+        request.solve_for_shortest_path,
+        request.max_solv_time_in_sec,
+        start_cars if request.start_cars else None,
+    )
+    return JobResponse(job_id=job.id)
+
+
+def get_job_or_404(job_id: str):
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str) -> dict:
+    """Status, best solution so far and final result of a job."""
+    return get_job_or_404(job_id).summary()
+
+
+@app.get("/jobs/{job_id}/stream")
+def stream_job(job_id: str) -> StreamingResponse:
+    """Server-sent events with every better solution until the job finishes."""
+    job = get_job_or_404(job_id)
+    return StreamingResponse(job.events(), media_type="text/event-stream")
+
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str) -> dict:
+    """Stops the search early; the best solution so far becomes the result."""
+    job_store.cancel(job_id)
+    return get_job_or_404(job_id).summary()
+
+
+class TuneRequest(BaseModel):
+    scenario_id: str
+    solve_for_shortest_path: Optional[bool] = False
+    # Time limit of every probe solve; a tuning runs a few dozen of them
+    probe_time_in_sec: float = 1
+
+
+@app.post("/solver/tune")
+async def tune_solver(request: TuneRequest) -> dict:
+    """
+    Probes capacity and objective weights on the scenario and stores the best
+    profile for scenarios of its size.
+    """
+    try:
+        scenario = await fetch_scenario(request.scenario_id)
+        profile = await tune_profile_async(
+            [scenario], request.solve_for_shortest_path, request.probe_time_in_sec
+        )
+    except SolverBusyError as exc:
+        raise HTTPException(status_code=429, detail=str(exc))
+    except Exception as exc:
+        print(str(exc))
+        raise HTTPException(status_code=400, detail=str(exc))
+    return asdict(profile)
+
+
+@app.get("/solver/profiles")
+def solver_profiles() -> dict:
+    """Tuned profiles by size class and objective."""
+    return profile_store.all()
+
+
+@app.get("/solver-cache")
+def solver_cache_stats() -> dict:
+    """Hit/miss counters and size of the solution cache."""
+    return solution_cache.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics() -> PlainTextResponse:
+    """Solver phase timings, dispatcher latencies and pool and cache state."""
+    metrics.set_gauge("solver_pool_pending", solver_pool.pending)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/solver-traces")
+def solver_traces() -> list[dict]:
+    """Phase timings and objective over time of the most recent solves."""
+    return metrics.recent_traces()
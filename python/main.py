@@ -1,74 +1,456 @@
-import requests
+import asyncio
+from collections import deque
+import httpx
+import numpy as np
 from scenario_model import Scenario
+from _scenario_columns import ScenarioColumns
 from patch_model import VehiclesUpdate, OneVehicleUpdate
 import time
-from _create_route import get_routing_solution
+from _create_route import (
+    NoSolutionError,
+    get_greedy_solution,
+    get_routing_solution_or_greedy,
+    pin_busy_vehicles,
+    replan_routing_solution,
+)
+from _metrics import metrics
+from _solution_cache import solution_cache, solution_cache_key
+from _solver_pool import SolverBusyError, solver_pool
+from _portfolio import DEFAULT_PORTFOLIO, get_portfolio_solution_async
+from _decomposition import (
+    DECOMPOSE_THRESHOLD,
+    merge_solutions,
+    split_scenario,
+)
 import os
 
+RUNNER_URL = os.environ.get("8090_URL", "http://localhost:8090")
+POLL_INTERVAL_IN_SEC = float(os.environ.get("DISPATCH_POLL_INTERVAL", 2))
+MAX_BACKOFF_IN_SEC = float(os.environ.get("DISPATCH_MAX_BACKOFF", 30))
+MIN_POLL_INTERVAL_IN_SEC = float(os.environ.get("DISPATCH_MIN_POLL_INTERVAL", 0.1))
+# Rolling horizon: also replan every this many seconds, 0 only replans on changes
+REPLAN_INTERVAL_IN_SEC = float(os.environ.get("DISPATCH_REPLAN_INTERVAL", 0))
 
-def run_solver(
+_http_client: httpx.AsyncClient | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Returns the keep-alive connection pool shared by all dispatchers."""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            base_url=RUNNER_URL,
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=200),
+            timeout=10,
+        )
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def parse_scenario(response_data: dict) -> ScenarioColumns:
+    if "message" in response_data and response_data["message"] == "Scenario not found":
+        raise ValueError("Scenario was not found for id.")
+    # Column arrays straight from the JSON, without validating pydantic models
+    return ScenarioColumns.from_json(response_data)
+
+
+async def fetch_scenario(scenario_id: str) -> ScenarioColumns:
+    fetch_start = time.perf_counter()
+    response = await get_http_client().get(f"/Scenarios/get_scenario/{scenario_id}")
+    scenario = parse_scenario(response.json())
+    metrics.observe("scenario_fetch_seconds", time.perf_counter() - fetch_start)
+    return scenario
+
+
+async def run_solver_async(
     scenario_id: str,
     hub_coords: tuple[float, float] | None,
     solve_for_shortest_path: bool | None,
     max_solv_time_in_sec: int = 10,
+    use_cache: bool = True,
+    allow_degraded: bool = False,
+    portfolio: bool = False,
 ):
-    get_url = (
-        os.environ.get("8090_URL", "http://localhost:8090")
-        + f"/Scenarios/get_scenario/{scenario_id}"
+    """Fetch the scenario on the pooled client and solve it on the worker pool.
+
+    With allow_degraded a saturated worker pool answers with the greedy plan
+    instead of raising SolverBusyError. With portfolio several search
+    strategies race in parallel workers and the best plan is returned.
+    """
+    scenario = await fetch_scenario(scenario_id)
+    return await solve_scenario_async(
+        scenario,
+        hub_coords,
+        solve_for_shortest_path,
+        max_solv_time_in_sec,
+        use_cache,
+        allow_degraded,
+        portfolio,
     )
 
-    response_data = requests.get(get_url).json()
-    if "message" in response_data and response_data["message"] == "Scenario not found":
-        raise ValueError("Scenario was not found for id.")
-    scenario = Scenario.parse_obj(response_data)
-    return get_routing_solution(
-        scenario, hub_coords, solve_for_shortest_path, max_solv_time_in_sec
+
+def split_for_solving(scenario: ScenarioColumns) -> list[ScenarioColumns]:
+    """Large scenarios are split by area and the parts solved in parallel."""
+    if scenario.num_customers > DECOMPOSE_THRESHOLD:
+        return split_scenario(scenario)
+    return [scenario]
+
+
+async def solve_scenario_async(
+    scenario: ScenarioColumns,
+    hub_coords: tuple[float, float] | None,
+    solve_for_shortest_path: bool | None,
+    max_solv_time_in_sec: int = 10,
+    use_cache: bool = True,
+    allow_degraded: bool = False,
+    portfolio: bool = False,
+    sub_scenarios: list[ScenarioColumns] | None = None,
+):
+    """Solve an already fetched scenario on the worker pool, see run_solver_async.
+
+    sub_scenarios are the parts from split_for_solving, if already split.
+    """
+    cache_key = solution_cache_key(
+        scenario,
+        hub_coords,
+        solve_for_shortest_path,
+        max_solv_time_in_sec,
+        portfolio=portfolio,
+    )
+    if use_cache:
+        result = solution_cache.get(cache_key)
+        if result is not None:
+            return result
+    start_time = time.perf_counter()
+    if sub_scenarios is None:
+        sub_scenarios = split_for_solving(scenario)
+    portfolio = portfolio and len(sub_scenarios) == 1
+    # Every portfolio member takes a worker; parts take up to all of them and
+    # the rest wait for a free one
+    if portfolio:
+        num_calls = len(DEFAULT_PORTFOLIO)
+    else:
+        num_calls = min(len(sub_scenarios), solver_pool.max_workers)
+    if allow_degraded and not solver_pool.can_admit(num_calls):
+        # Off the event loop, it is overloaded already
+        return await asyncio.to_thread(
+            get_greedy_solution, scenario, hub_coords, solve_for_shortest_path
+        )
+    if portfolio:
+        try:
+            result = await get_portfolio_solution_async(
+                scenario, hub_coords, solve_for_shortest_path, max_solv_time_in_sec
+            )
+        except NoSolutionError:
+            print("No solution found, falling back to the greedy plan.")
+            return await asyncio.to_thread(
+                get_greedy_solution, scenario, hub_coords, solve_for_shortest_path
+            )
+        solution_cache.put(cache_key, result)
+        return result
+    # All parts are admitted together, and fail together; parts beyond the
+    # pool's workers are solved as soon as a worker frees up
+    results_and_fallbacks = await solver_pool.submit_all(
+        get_routing_solution_or_greedy,
+        [
+            (sub_scenario, hub_coords, solve_for_shortest_path, max_solv_time_in_sec)
+            for sub_scenario in sub_scenarios
+        ],
     )
+    results = [result for result, _ in results_and_fallbacks]
+    if len(results) == 1:
+        result = results[0]
+    else:
+        result = merge_solutions(results, time.perf_counter() - start_time)
+    # Greedy fallback plans are not served again to identical requests
+    if not any(fallback for _, fallback in results_and_fallbacks):
+        solution_cache.put(cache_key, result)
+    return result
 
 
-def run_main(scenario_id: str, car_routes):
+async def replan_scenario_async(
+    scenario: ScenarioColumns,
+    hub_coords: tuple[float, float] | None,
+    car_routes: dict[str, list[str]],
+    solve_for_shortest_path: bool | None,
+    max_solv_time_in_sec: float,
+):
+    """replan_routing_solution on the worker pool, split by area like a solve."""
     start_time = time.perf_counter()
-    get_url = (
-        os.environ.get("8090_URL", "http://localhost:8090")
-        + f"/Scenarios/get_scenario/{scenario_id}"
+    # Pinned first, so that every part knows where its busy vehicles end up
+    sub_scenarios = split_for_solving(pin_busy_vehicles(scenario))
+    results = await solver_pool.submit_all(
+        replan_routing_solution,
+        [
+            (
+                sub_scenario,
+                hub_coords,
+                car_routes,
+                solve_for_shortest_path,
+                max_solv_time_in_sec,
+            )
+            for sub_scenario in sub_scenarios
+        ],
     )
-    update_url = (
-        os.environ.get("8090_URL", "http://localhost:8090")
-        + f"/Scenarios/update_scenario/{scenario_id}"
+    if len(results) == 1:
+        return results[0]
+    return merge_solutions(results, time.perf_counter() - start_time)
+
+
+async def run_batch_solver_async(
+    scenario_ids: list[str],
+    hub_coords: tuple[float, float] | None,
+    solve_for_shortest_path: bool | None,
+    max_solv_time_in_sec: float = 10,
+    max_concurrent: int | None = None,
+):
+    """Yield (scenario_id, result or exception) for every scenario as it is solved.
+
+    All scenarios are fetched concurrently and solved each with its own time
+    budget, using at most max_concurrent workers (by default all of them) at
+    a time, so the batch does not overflow the pool's queue. A decomposed
+    scenario takes one worker per part.
+    """
+    max_workers = max_concurrent or solver_pool.max_workers
+    workers_in_use = 0
+    workers_freed = asyncio.Condition()
+
+    async def solve(scenario_id: str):
+        nonlocal workers_in_use
+        try:
+            scenario = await fetch_scenario(scenario_id)
+            sub_scenarios = split_for_solving(scenario)
+            # Scenarios with more parts than workers run on their own
+            workers = min(len(sub_scenarios), max_workers)
+            async with workers_freed:
+                await workers_freed.wait_for(
+                    lambda: workers_in_use + workers <= max_workers
+                )
+                workers_in_use += workers
+            try:
+                result = await solve_scenario_async(
+                    scenario,
+                    hub_coords,
+                    solve_for_shortest_path,
+                    max_solv_time_in_sec,
+                    sub_scenarios=sub_scenarios,
+                )
+            finally:
+                async with workers_freed:
+                    workers_in_use -= workers
+                    workers_freed.notify_all()
+            return scenario_id, result
+        except Exception as exc:
+            return scenario_id, exc
+
+    tasks = [asyncio.create_task(solve(scenario_id)) for scenario_id in scenario_ids]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # The client went away: stop solving the rest
+        for task in tasks:
+            task.cancel()
+
+
+def next_poll_delay(
+    scenario: ScenarioColumns,
+    route_queues: dict[str, deque[str]],
+    poll_interval: float = POLL_INTERVAL_IN_SEC,
+    min_poll_interval: float = MIN_POLL_INTERVAL_IN_SEC,
+) -> float:
+    """Seconds until the next busy car with customers left is predicted to be free."""
+    has_queue = np.array(
+        [bool(route_queues.get(car_id)) for car_id in scenario.vehicle_ids.tolist()],
+        dtype=bool,
     )
-    response_data = requests.get(get_url).json()
+    remaining_times = scenario.vehicle_remaining_travel_time[
+        ~scenario.vehicle_available & has_queue
+    ]
+    # Unknown remaining times are NaN
+    remaining_times = remaining_times[~np.isnan(remaining_times)]
+    if not remaining_times.size:
+        return poll_interval
+    return min(max(float(remaining_times.min()), min_poll_interval), poll_interval)
+
+
+async def run_main(
+    scenario_id: str,
+    car_routes: dict[str, list[str]],
+    hub_coords: tuple[float, float] | None = None,
+    solve_for_shortest_path: bool | None = False,
+    replan_time_in_sec: float = 0.5,
+    poll_interval: float = POLL_INTERVAL_IN_SEC,
+    max_backoff: float = MAX_BACKOFF_IN_SEC,
+    min_poll_interval: float = MIN_POLL_INTERVAL_IN_SEC,
+    replan_interval: float = REPLAN_INTERVAL_IN_SEC,
+):
+    """Dispatch the planned routes and keep replanning while the scenario runs.
+
+    Unserved customers are replanned on the worker pool (warm-started from
+    the routes still to be dispatched, within replan_time_in_sec) when
+    customers arrive or start waiting again, when the fleet changes and every
+    replan_interval seconds. A replan the busy pool rejects is retried on the
+    next tick.
+    """
+    start_time = time.perf_counter()
+    client = get_http_client()
+    get_path = f"/Scenarios/get_scenario/{scenario_id}"
+    update_path = f"/Scenarios/update_scenario/{scenario_id}"
+
+    backoff = poll_interval
+    scenario = None
+    known_customer_ids = set()
+    known_awaiting_ids = set()
+    known_vehicle_ids = []
+    last_replan = time.perf_counter()
+    replan_pending = False
+    # Customers still to be dispatched, keyed by vehicle id
+    route_queues = {
+        vehicle_id: deque(route) for vehicle_id, route in car_routes.items()
+    }
+    # The vehicle whose queue holds each customer
+    queued_on = {
+        customer_id: vehicle_id
+        for vehicle_id, route in car_routes.items()
+        for customer_id in route
+    }
+    # (isAvailable, customerId) per vehicle when it was last looked at
+    vehicle_states: dict[str, tuple[bool, str]] = {}
+    idle_vehicle_ids = set()
     cars = VehiclesUpdate(vehicles=[])
-    scenario = Scenario.parse_obj(response_data)
-    while scenario.status != "COMPLETED":
-        response_data = requests.get(get_url).json()
-        if (
-            "message" in response_data
-            and response_data["message"] == "Scenario not found"
-        ):
-            raise ValueError("Scenario was not found for id.")
+    while scenario is None or scenario.status != "COMPLETED":
+        poll_start = time.perf_counter()
+        try:
+            response = await client.get(get_path)
+            response_data = response.json()
+        except (httpx.HTTPError, ValueError) as exc:
+            # Runner is unreachable or overloaded: back off exponentially
+            print(f"Polling scenario {scenario_id} failed: {exc}")
+            metrics.inc("dispatcher_poll_failures_total")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, max_backoff)
+            continue
+        tick_start = time.perf_counter()
+        metrics.observe("dispatcher_poll_seconds", tick_start - poll_start)
+        backoff = poll_interval
+        scenario = parse_scenario(response_data)
+        customer_ids = set(scenario.customer_ids.tolist())
+        awaiting_ids = set(scenario.customer_ids[scenario.customer_awaiting].tolist())
+        vehicle_ids = scenario.vehicle_ids.tolist()
 
-        scenario = Scenario.parse_obj(response_data)
-        for i, car in enumerate(scenario.vehicles):
-            if car.isAvailable:
-                if car_routes[i] != []:
-                    cars.vehicles.append(
-                        OneVehicleUpdate(id=car.id, customerId=car_routes[i][0])
-                    )
-                    car_routes[i] = car_routes[i][1:]
+        # Customers served by someone else or withdrawn are not sent out, our
+        # own dispatches have left their queue already
+        withdrawn_ids = known_awaiting_ids - awaiting_ids
+        for customer_id in withdrawn_ids:
+            vehicle_id = queued_on.pop(customer_id, None)
+            if vehicle_id is not None:
+                route_queues[vehicle_id].remove(customer_id)
+
+        scenario_changed = known_vehicle_ids and (
+            not customer_ids <= known_customer_ids
+            or not awaiting_ids <= known_awaiting_ids
+            or vehicle_ids != known_vehicle_ids
+        )
+        replan_due = (
+            replan_interval
+            and awaiting_ids
+            and time.perf_counter() - last_replan >= replan_interval
+        )
+        if scenario_changed or replan_due or replan_pending:
+            # Warm-start from the routes still to be dispatched
+            replan_start = time.perf_counter()
+            try:
+                car_routes, *_ = await replan_scenario_async(
+                    scenario,
+                    hub_coords,
+                    {
+                        vehicle_id: list(queue)
+                        for vehicle_id, queue in route_queues.items()
+                    },
+                    solve_for_shortest_path,
+                    replan_time_in_sec,
+                )
+            except SolverBusyError:
+                print(f"Solver pool is busy, replanning {scenario_id} next tick.")
+                replan_pending = True
+            else:
+                replan_pending = False
+                route_queues = {
+                    vehicle_id: deque(route) for vehicle_id, route in car_routes.items()
+                }
+                queued_on = {
+                    customer_id: vehicle_id
+                    for vehicle_id, route in car_routes.items()
+                    for customer_id in route
+                }
+                # Idle vehicles may have received customers, so look at them again
+                for vehicle_id in idle_vehicle_ids:
+                    vehicle_states.pop(vehicle_id, None)
+                idle_vehicle_ids.clear()
+                last_replan = time.perf_counter()
+                metrics.observe("dispatcher_replan_seconds", last_replan - replan_start)
+                print("Replanned routes.")
+        known_customer_ids = customer_ids
+        known_awaiting_ids = awaiting_ids
+        known_vehicle_ids = vehicle_ids
+
+        for car_id, is_available, customer_id in zip(
+            vehicle_ids,
+            scenario.vehicle_available.tolist(),
+            scenario.vehicle_customer_ids.tolist(),
+        ):
+            state = (is_available, customer_id)
+            if vehicle_states.get(car_id) == state:
+                continue
+            vehicle_states[car_id] = state
+            if not is_available:
+                continue
+            queue = route_queues.get(car_id)
+            if queue:
+                customer_id = queue.popleft()
+                del queued_on[customer_id]
+                cars.vehicles.append(
+                    OneVehicleUpdate(id=car_id, customerId=customer_id)
+                )
+            else:
+                idle_vehicle_ids.add(car_id)
 
         if cars.vehicles:
-            response = requests.put(update_url, json=cars.dict())
-            if response.status_code == 200:
+            update_start = time.perf_counter()
+            try:
+                response = await client.put(update_path, json=cars.dict())
+                response.raise_for_status()
                 print("Update a car.")
+                update_end = time.perf_counter()
+                metrics.observe("dispatcher_update_seconds", update_end - update_start)
+                metrics.observe("dispatcher_tick_seconds", update_end - tick_start)
+            except httpx.HTTPError as exc:
+                print(f"Updating scenario {scenario_id} failed: {exc}")
+                metrics.inc("dispatcher_update_failures_total")
+                # Put the customers back so they are sent again on the next tick
+                for update in cars.vehicles:
+                    route_queues[update.id].appendleft(update.customerId)
+                    queued_on[update.customerId] = update.id
+                    vehicle_states.pop(update.id, None)
             cars = VehiclesUpdate(vehicles=[])
-        time.sleep(2)
+        # Wake up when the next car frees up instead of on a fixed tick
+        await asyncio.sleep(
+            next_poll_delay(scenario, route_queues, poll_interval, min_poll_interval)
+        )
 
     print("completed")
     end_time = time.perf_counter()
     elapsed_time = end_time - start_time
     print(f"Elapsed time: {elapsed_time} seconds")
-    print(f"Start time:{scenario.startTime}")
-    print(f"End time:{scenario.endTime}")
+    print(f"Start time:{scenario.start_time}")
+    print(f"End time:{scenario.end_time}")
     return
 
 
@@ -78,4 +460,4 @@ if __name__ == "__main__":
     scenario2 = Scenario.parse_file((Path(__file__).parent / "example.json"))
     # from initialise_scenario import init_scenario
     # scenario = init_scenario(0.01, 5, 20)
-    run_main(scenario2, False)
+    asyncio.run(run_main(scenario2, False))
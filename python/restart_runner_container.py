@@ -1,6 +1,37 @@
+import os
 import subprocess
 import time
 
+import requests
+
+HOST = os.environ.get("API_HOST", "localhost")
+# Any answer of the backend and the runner means they are up; the solver
+# service is only ready once its workers are warmed up.
+READINESS_URLS = [
+    f"http://{HOST}:8080/",
+    f"http://{HOST}:8090/",
+    f"http://{HOST}:8086/ready",
+]
+
+
+def wait_until_ready(
+    urls: list[str] = READINESS_URLS,
+    timeout_in_sec: float = 120,
+    interval_in_sec: float = 0.5,
+):
+    """Poll every url until it answers without a server error."""
+    deadline = time.monotonic() + timeout_in_sec
+    for url in urls:
+        while True:
+            try:
+                if requests.get(url, timeout=interval_in_sec * 4).status_code < 500:
+                    break
+            except requests.RequestException:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} not ready after {timeout_in_sec}s.")
+            time.sleep(interval_in_sec)
+
 
 def restart_and_wait_for_service(compose_file_path):
     """Restart a Docker service and wait until it's running using 'docker ps'."""
@@ -29,4 +60,6 @@ def restart_and_wait_for_service(compose_file_path):
     except subprocess.CalledProcessError as e:
         print(f"An error occurred: {e.stderr.decode()}")
         raise RuntimeError("Failed to execute docker-compose commands.")
-    time.sleep(15)
+    start_time = time.monotonic()
+    wait_until_ready()
+    print(f"All services ready after {time.monotonic() - start_time:.1f}s.")
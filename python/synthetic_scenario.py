@@ -0,0 +1,62 @@
+import numpy as np
+
+from _scenario_columns import ScenarioColumns
+
+# Rough bounding box of Munich (latitude, longitude)
+MUNICH_MIN = np.array([48.10, 11.50])
+MUNICH_MAX = np.array([48.18, 11.65])
+
+
+def _uniform_points(rng: np.random.Generator, n: int) -> np.ndarray:
+    return rng.uniform(MUNICH_MIN, MUNICH_MAX, size=(n, 2))
+
+
+def _clustered_points(
+    rng: np.random.Generator, n: int, centres: np.ndarray, spread: float
+) -> np.ndarray:
+    points = centres[rng.integers(len(centres), size=n)]
+    points = points + rng.normal(scale=spread, size=(n, 2))
+    return np.clip(points, MUNICH_MIN, MUNICH_MAX)
+
+
+def make_scenario(
+    n_vehicles: int,
+    n_customers: int,
+    layout: str = "uniform",
+    seed: int = 0,
+    n_hotspots: int = 5,
+    spread: float = 0.005,
+) -> ScenarioColumns:
+    """Reproducible scenario with uniformly spread or clustered customers.
+
+    In the clustered layout pickups and destinations are drawn around a few
+    hotspots, vehicles are always spread uniformly.
+    """
+    rng = np.random.default_rng(seed)
+    if layout == "uniform":
+        pickups = _uniform_points(rng, n_customers)
+        destinations = _uniform_points(rng, n_customers)
+    elif layout == "clustered":
+        centres = _uniform_points(rng, n_hotspots)
+        pickups = _clustered_points(rng, n_customers, centres, spread)
+        destinations = _clustered_points(rng, n_customers, centres, spread)
+    else:
+        raise ValueError(f"Unknown layout {layout!r}.")
+    vehicle_coords = _uniform_points(rng, n_vehicles)
+
+    return ScenarioColumns(
+        id=f"synthetic-{layout}-{n_vehicles}x{n_customers}-{seed}",
+        status="CREATED",
+        start_time=None,
+        end_time=None,
+        vehicle_ids=np.array([f"vehicle-{i}" for i in range(n_vehicles)], dtype=str),
+        vehicle_coords=vehicle_coords,
+        vehicle_available=np.ones(n_vehicles, dtype=bool),
+        vehicle_customer_ids=np.full(n_vehicles, ""),
+        vehicle_remaining_travel_time=np.full(n_vehicles, np.nan),
+        vehicle_speed=np.full(n_vehicles, np.nan),
+        customer_ids=np.array([f"customer-{i}" for i in range(n_customers)], dtype=str),
+        customer_coords=pickups,
+        customer_destinations=destinations,
+        customer_awaiting=np.ones(n_customers, dtype=bool),
+    )
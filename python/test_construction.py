@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+from _construction import _regret_insertion, evaluate_routes, greedy_routes
+
+
+def random_instance(num_vehicles: int, num_customers: int, num_classes: int = 1):
+    """Travel times between pickups 2i, destinations 2i + 1 and the starts."""
+    rng = np.random.default_rng(num_vehicles * 1000 + num_customers)
+    points = rng.uniform(0, 100, (2 * num_customers + num_vehicles, 2))
+    distances = np.hypot(*(points[:, np.newaxis] - points[np.newaxis]).T)
+    # One matrix per speed class, the later classes are slower
+    time_matrix = np.rint(
+        distances[np.newaxis] * np.arange(1, num_classes + 1)[:, None, None]
+    ).astype(np.int64)
+    pickup_nodes = np.arange(0, 2 * num_customers, 2)
+    delivery_nodes = pickup_nodes + 1
+    start_nodes = list(range(2 * num_customers, len(points)))
+    vehicle_classes = [vehicle % num_classes for vehicle in range(num_vehicles)]
+    return time_matrix, pickup_nodes, delivery_nodes, start_nodes, vehicle_classes
+
+
+@pytest.mark.parametrize("solve_for_shortest_path", [False, True])
+@pytest.mark.parametrize("num_vehicles,num_classes", [(1, 1), (4, 1), (5, 2)])
+def test_every_customer_once_within_capacity(
+    solve_for_shortest_path, num_vehicles, num_classes
+):
+    num_customers = 12
+    time_matrix, pickups, deliveries, starts, classes = random_instance(
+        num_vehicles, num_customers, num_classes
+    )
+    capacity = [int(np.ceil(num_customers / num_vehicles)) + 1] * num_vehicles
+
+    routes = greedy_routes(
+        time_matrix,
+        pickups,
+        deliveries,
+        starts,
+        capacity,
+        solve_for_shortest_path,
+        classes,
+    )
+    assert len(routes) == num_vehicles
+    assert sorted(c for route in routes for c in route) == list(range(num_customers))
+    assert all(len(route) <= cap for route, cap in zip(routes, capacity))
+
+
+def test_exhausted_vehicles_get_no_more_customers():
+    time_matrix, pickups, deliveries, starts, classes = random_instance(3, 6)
+    capacity = [0, 1, 5]
+
+    for solve_for_shortest_path in (False, True):
+        routes = greedy_routes(
+            time_matrix, pickups, deliveries, starts, capacity, solve_for_shortest_path
+        )
+        assert [len(route) for route in routes] == [0, 1, 5]
+
+
+@pytest.mark.parametrize("solve_for_shortest_path", [False, True])
+def test_too_small_capacities_raise(solve_for_shortest_path):
+    time_matrix, pickups, deliveries, starts, _ = random_instance(2, 5)
+
+    with pytest.raises(ValueError):
+        greedy_routes(
+            time_matrix, pickups, deliveries, starts, [2, 2], solve_for_shortest_path
+        )
+
+
+def test_route_times_drive_each_customer_straight_to_the_destination():
+    time_matrix, pickups, deliveries, starts, classes = random_instance(3, 9, 2)
+    routes = greedy_routes(time_matrix, pickups, deliveries, starts, [4] * 3, False)
+
+    route_times, makespan = evaluate_routes(
+        time_matrix, routes, pickups, deliveries, starts, classes
+    )
+    for vehicle, route in enumerate(routes):
+        matrix = time_matrix[classes[vehicle]]
+        expected, node = 0, starts[vehicle]
+        for customer in route:
+            expected += matrix[node, pickups[customer]]
+            expected += matrix[pickups[customer], deliveries[customer]]
+            node = deliveries[customer]
+        assert route_times[vehicle] == expected
+    assert makespan == route_times.max()
+
+
+def test_regret_insertion_picks_the_customer_with_most_to_lose():
+    scores = np.array(
+        [
+            [10.0, 10.0, np.inf],
+            [11.0, 30.0, np.inf],
+        ]
+    )
+    # Customer 1 loses 20 without vehicle 0, customer 0 only 1; customer 2
+    # is assigned already
+    assert _regret_insertion(scores) == (0, 1)
+
+
+def test_regret_insertion_breaks_ties_by_the_cheapest_best():
+    # Equal regrets, e.g. vehicles of two speed classes with equal gaps
+    scores = np.array(
+        [
+            [20.0, 10.0],
+            [25.0, 15.0],
+        ]
+    )
+    assert _regret_insertion(scores) == (0, 1)
+
+
+def test_regret_insertion_with_one_vehicle_takes_the_cheapest():
+    assert _regret_insertion(np.array([[7.0, 3.0, np.inf]])) == (0, 1)
+
+
+def test_regret_insertion_raises_when_nothing_fits():
+    with pytest.raises(ValueError):
+        _regret_insertion(np.full((2, 3), np.inf))
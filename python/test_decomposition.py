@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from _decomposition import merge_solutions, split_scenario
+from synthetic_scenario import make_scenario
+
+
+@pytest.mark.parametrize(
+    "num_vehicles,num_customers,layout",
+    [(10, 400, "uniform"), (20, 900, "clustered"), (3, 900, "uniform")],
+)
+def test_split_shares_out_every_vehicle_and_customer_once(
+    num_vehicles, num_customers, layout
+):
+    scenario = make_scenario(num_vehicles, num_customers, layout)
+
+    parts = split_scenario(scenario)
+    assert 1 < len(parts) <= num_vehicles
+    assert all(part.num_vehicles >= 1 for part in parts)
+    vehicle_ids = np.concatenate([part.vehicle_ids for part in parts])
+    customer_ids = np.concatenate([part.customer_ids for part in parts])
+    assert sorted(vehicle_ids.tolist()) == sorted(scenario.vehicle_ids.tolist())
+    assert sorted(customer_ids.tolist()) == sorted(scenario.customer_ids.tolist())
+
+
+def test_split_with_one_vehicle_keeps_the_scenario_whole():
+    scenario = make_scenario(1, 400)
+    parts = split_scenario(scenario)
+    assert len(parts) == 1 and parts[0] is scenario
+
+
+def test_merge_solutions():
+    results = [
+        ({"vehicle-0": ["customer-0"]}, 10, 7, 1.0),
+        ({"vehicle-1": ["customer-1"], "vehicle-2": []}, 5, 5, 2.0),
+    ]
+    assert merge_solutions(results, 3.0) == (
+        {"vehicle-0": ["customer-0"], "vehicle-1": ["customer-1"], "vehicle-2": []},
+        15,
+        7,
+        3.0,
+    )
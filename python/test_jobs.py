@@ -0,0 +1,29 @@
+import asyncio
+
+import _jobs
+from _jobs import JobStore
+from synthetic_scenario import make_scenario
+
+
+class UnusedSolverPool:
+    async def submit(self, *args, **kwargs):
+        raise AssertionError("A cancelled job was solved.")
+
+
+def test_cancel_before_the_job_runs(monkeypatch):
+    monkeypatch.setattr(_jobs, "solver_pool", UnusedSolverPool())
+    job_store = JobStore()
+
+    async def run():
+        job = job_store.submit(make_scenario(2, 4), None, False, 10)
+        # The job is still waiting for the manager to create its event
+        assert job_store.cancel(job.id).status == "queued"
+        await job.task
+        return job
+
+    try:
+        job = asyncio.run(run())
+    finally:
+        job_store.shutdown()
+    assert job.status == "cancelled"
+    assert job.result is None and job.error is None
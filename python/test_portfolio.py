@@ -0,0 +1,14 @@
+import pytest
+
+from _portfolio import DEFAULT_PORTFOLIO, config_name, solve_config
+from synthetic_scenario import make_scenario
+
+
+@pytest.mark.parametrize("config", DEFAULT_PORTFOLIO, ids=config_name)
+@pytest.mark.parametrize("layout", ["uniform", "clustered"])
+def test_every_portfolio_member_finds_a_solution(config, layout):
+    scenario = make_scenario(5, 20, layout=layout)
+    # Raises NoSolutionError instead of falling back to the greedy plan
+    car_routes, *_ = solve_config(config, scenario, None, False, 1)
+    routed = [customer for route in car_routes.values() for customer in route]
+    assert sorted(routed) == sorted(scenario.customer_ids.tolist())
@@ -0,0 +1,68 @@
+import asyncio
+
+import numpy as np
+
+import _decomposition
+import main
+from _create_route import replan_routing_solution
+from _scenario_columns import ScenarioColumns
+
+
+def busy_car_scenario(remaining_travel_time: float) -> ScenarioColumns:
+    """vehicle-0 is driving customer-0 to where customer-1 waits; the idle
+    vehicles are a few kilometres away."""
+    return ScenarioColumns(
+        id="replan",
+        status="RUNNING",
+        start_time=None,
+        end_time=None,
+        vehicle_ids=np.array(["vehicle-0", "vehicle-1", "vehicle-2"]),
+        vehicle_coords=np.array([[48.13, 11.55], [48.16, 11.60], [48.16, 11.61]]),
+        vehicle_available=np.array([False, True, True]),
+        vehicle_customer_ids=np.array(["customer-0", "", ""]),
+        vehicle_remaining_travel_time=np.array([remaining_travel_time, np.nan, np.nan]),
+        vehicle_speed=np.full(3, np.nan),
+        customer_ids=np.array(["customer-0", "customer-1", "customer-2"]),
+        customer_coords=np.array([[48.13, 11.55], [48.14, 11.56], [48.15, 11.60]]),
+        customer_destinations=np.array(
+            [[48.14, 11.56], [48.14, 11.58], [48.15, 11.62]]
+        ),
+        customer_awaiting=np.array([False, True, True]),
+    )
+
+
+def test_replan_prefers_busy_car_that_is_about_to_be_free():
+    car_routes, _, _, _ = replan_routing_solution(
+        busy_car_scenario(0), None, {}, max_solv_time_in_sec=1
+    )
+    assert car_routes["vehicle-0"] == ["customer-1"]
+
+
+def test_replan_does_not_load_busy_car_with_long_remaining_trip():
+    # Two hours until vehicle-0 has dropped off customer-0
+    car_routes, _, makespan, _ = replan_routing_solution(
+        busy_car_scenario(7200), None, {}, max_solv_time_in_sec=1
+    )
+    assert car_routes["vehicle-0"] == []
+    assert sorted(car_routes["vehicle-1"] + car_routes["vehicle-2"]) == [
+        "customer-1",
+        "customer-2",
+    ]
+    # The committed trip counts towards the plan
+    assert makespan >= 120
+
+
+def test_replan_on_the_pool_split_by_area(solver_pool, monkeypatch):
+    monkeypatch.setattr(main, "solver_pool", solver_pool)
+    # One part per open customer
+    monkeypatch.setattr(main, "DECOMPOSE_THRESHOLD", 1)
+    monkeypatch.setattr(_decomposition, "CUSTOMERS_PER_CLUSTER", 1)
+
+    car_routes, _, makespan, _ = asyncio.run(
+        main.replan_scenario_async(busy_car_scenario(7200), None, {}, False, 1)
+    )
+    assert sorted(car_routes) == ["vehicle-0", "vehicle-1", "vehicle-2"]
+    routed = [customer for route in car_routes.values() for customer in route]
+    assert sorted(routed) == ["customer-1", "customer-2"]
+    # The busy vehicle kept its committed trip in whatever part it went to
+    assert makespan >= 120
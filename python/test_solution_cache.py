@@ -0,0 +1,65 @@
+import os
+
+import _solution_cache
+from _solution_cache import SolutionCache
+
+
+def result(value: int) -> tuple:
+    return ({"vehicle-0": [f"customer-{value}"]}, value, value, 0.1)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+def test_entries_expire_after_the_ttl(monkeypatch, tmp_path):
+    clock = Clock()
+    monkeypatch.setattr(_solution_cache.time, "time", clock.time)
+    cache = SolutionCache(ttl_in_sec=60, cache_dir=tmp_path)
+    cache.put("a", result(1))
+
+    clock.now += 59
+    assert cache.get("a") == result(1)
+    clock.now += 2
+    assert cache.get("a") is None
+    # The expired result is deleted from the disk too
+    assert list(tmp_path.glob("*.pkl")) == []
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = SolutionCache(max_entries=2, cache_dir=tmp_path)
+    cache.put("a", result(1))
+    cache.put("b", result(2))
+    cache.get("a")
+    cache.put("c", result(3))
+
+    assert cache.get("b") is None
+    assert cache.get("a") == result(1) and cache.get("c") == result(3)
+    assert sorted(path.stem for path in tmp_path.glob("*.pkl")) == ["a", "c"]
+
+
+def test_results_are_persisted_and_copied(tmp_path):
+    cache = SolutionCache(cache_dir=tmp_path)
+    cache.put("a", result(1))
+    cache.get("a")[0]["vehicle-0"].clear()
+
+    assert SolutionCache(cache_dir=tmp_path).get("a") == result(1)
+    assert cache.get("a") == result(1)
+
+
+def test_disk_is_pruned_to_max_entries(tmp_path):
+    # e.g. written by other processes or earlier runs with a larger cache
+    writer = SolutionCache(max_entries=10, cache_dir=tmp_path)
+    for i, key in enumerate("abcde"):
+        writer.put(key, result(i))
+        # Distinct modification times, oldest first
+        path = tmp_path / f"{key}.pkl"
+        os.utime(path, (1000 + i, 1000 + i))
+
+    SolutionCache(max_entries=2, cache_dir=tmp_path)
+    assert sorted(path.stem for path in tmp_path.glob("*.pkl")) == ["d", "e"]
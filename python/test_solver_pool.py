@@ -0,0 +1,69 @@
+import asyncio
+import math
+
+import pytest
+
+import main
+from _solution_cache import SolutionCache
+from _solver_pool import SolverBusyError, SolverPool
+from synthetic_scenario import make_scenario
+
+
+async def wait_until_released(solver_pool: SolverPool):
+    while solver_pool.pending:
+        await asyncio.sleep(0.01)
+
+
+def test_submit_all_runs_more_calls_than_the_pool_holds(solver_pool):
+    async def run():
+        results = await solver_pool.submit_all(pow, [(2, n) for n in range(5)])
+        return results, solver_pool.pending
+
+    assert asyncio.run(run()) == ([1, 2, 4, 8, 16], 0)
+
+
+def test_submit_all_fails_together_and_releases_the_pool(solver_pool):
+    async def run():
+        with pytest.raises(ValueError):
+            await solver_pool.submit_all(math.sqrt, [(4,), (-1,), (9,)])
+        await asyncio.wait_for(wait_until_released(solver_pool), 10)
+
+    asyncio.run(run())
+
+
+def test_submit_all_rejects_calls_beyond_free_places(solver_pool):
+    async def run():
+        solver_pool.pending = solver_pool.max_pending
+        try:
+            with pytest.raises(SolverBusyError):
+                await solver_pool.submit_all(pow, [(2, 1)])
+        finally:
+            solver_pool.pending = 0
+
+    asyncio.run(run())
+
+
+def test_scenario_with_more_parts_than_the_pool_holds(solver_pool, monkeypatch):
+    monkeypatch.setattr(main, "solver_pool", solver_pool)
+    scenario = make_scenario(10, 400)
+    sub_scenarios = main.split_for_solving(scenario)
+    assert len(sub_scenarios) > solver_pool.max_pending
+
+    car_routes, *_ = asyncio.run(
+        main.solve_scenario_async(scenario, None, False, 1, use_cache=False)
+    )
+    routed = [customer for route in car_routes.values() for customer in route]
+    assert sorted(routed) == sorted(scenario.customer_ids.tolist())
+    assert sorted(car_routes) == sorted(scenario.vehicle_ids.tolist())
+
+
+def test_greedy_fallback_plans_are_not_cached(solver_pool, monkeypatch):
+    monkeypatch.setattr(main, "solver_pool", solver_pool)
+    monkeypatch.setattr(main, "solution_cache", SolutionCache())
+    scenario = make_scenario(20, 250)
+
+    # Too little time for the search to find any solution
+    car_routes, *_ = asyncio.run(main.solve_scenario_async(scenario, None, False, 1e-3))
+    routed = [customer for route in car_routes.values() for customer in route]
+    assert sorted(routed) == sorted(scenario.customer_ids.tolist())
+    assert main.solution_cache.stats()["entries"] == 0
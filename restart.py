@@ -1,11 +1,30 @@
 import subprocess
+import time
+import urllib.error
+import urllib.request
+
+# The solver service answers 503 until its workers are warmed up
+READY_URL = 'http://localhost:8086/ready'
 
 def run_command(command):
     subprocess.run(command, check=True, shell=True)
 
+def wait_until_ready(url=READY_URL, timeout_in_sec=120, interval_in_sec=0.5):
+    deadline = time.monotonic() + timeout_in_sec
+    while True:
+        try:
+            with urllib.request.urlopen(url, timeout=2):
+                return
+        except (urllib.error.URLError, OSError):
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f'{url} not ready after {timeout_in_sec}s.')
+        time.sleep(interval_in_sec)
+
 def restart_containers():
     run_command('docker-compose down')
     run_command('docker-compose up -d')
+    wait_until_ready()
 
 if __name__ == "__main__":
-    restart_containers()
\ No newline at end of file
+    restart_containers()